@@ -15,12 +15,6 @@
              (lambda (x)
                      (car (cdr' x))))
 
-     (define len
-             (lambda (l)
-                     (if (nil? l)
-                         0
-                         (+ 1 (len (cdr' l))))))
-
      (define not
              (lambda (e)
                      (if e #f #t)))
@@ -29,19 +23,14 @@
              (lambda (a b)
                      (if (= a b) #f #t)))
 
-     (define cons'
-             (macro ()
-                    ((_ x y) (cons x (delay y)))))
-
-     (define cdr'
-             (macro ()
-                    ((_ x) (if (thunk? (cdr x))
-                               (eval (cdr x))
-                               (cdr x)))))
-
      (define list
              (lambda x x))
 
+     (define define-memo
+             (macro ()
+                    ((_ n v) (define n (memoize v)))
+                    ((_ n v s) (define n (memoize v s)))))
+
      (define when
              (macro ()
                     ((when c ...) (if c (begin ...) nil))))
@@ -1,11 +1,15 @@
 # coding: utf-8
 
+from collections import deque
+
 class Buffer(object):
     """
     A marked Buffer is an iterable object that support marking
     through the "with" statement. By such, one can restore the
     buffer up to the point where it was marked, and also, nest
-    marks and restore
+    marks and restore. Only the values that can still be read again (the
+    ones after the oldest active mark) are kept, so the memory is bounded by
+    the lookahead, not by the size of the input.
     """
 
     def __init__(self, iterable):
@@ -13,21 +17,28 @@ class Buffer(object):
         self.iterable = iterable
         self.iterator = iter(iterable)
         self.idx = 0
-        self.buffer = []
+        self.buffer = deque()
+        self.offset = 0 # the index of the first value in buffer
         self.marks = []
 
     def __iter__(self):
         while True:
             self.idx += 1
-            if self.idx-1 < len(self.buffer):
-                yield self.buffer[self.idx-1]
+            position = self.idx - 1 - self.offset
+            if position < len(self.buffer):
+                value = self.buffer[position]
             else:
-                value = next(self.iterator)
+                try:
+                    value = next(self.iterator)
+                except StopIteration:
+                    return
                 self.buffer.append(value)
-                yield value
+            if not self.marks:
+                self.trim()
+            yield value
 
     def __nonzero__(self):
-        if self.buffer:
+        if self.idx - self.offset < len(self.buffer):
             return True
         else:
             try:
@@ -37,6 +48,15 @@ class Buffer(object):
             except StopIteration:
                 return False
 
+    __bool__ = __nonzero__
+
+    def trim(self):
+        "Drops the values before the oldest mark (or before the current one)"
+        limit = self.marks[0] if self.marks else self.idx
+        while self.offset < limit and self.buffer:
+            self.buffer.popleft()
+            self.offset += 1
+
     def mark(self):
         return self
 
@@ -46,8 +66,9 @@ class Buffer(object):
 
     def __exit__(self, type, value, traceback):
         self.marks.pop()
+        if not self.marks:
+            self.trim()
 
     def restore(self):
         "Restore buffer up to the last mark"
         self.idx = self.marks[-1]
-
@@ -0,0 +1,156 @@
+# coding: utf-8
+
+"""
+Script bundles. A bundle is a single file with the expressions of a script
+and of every file it includes, already parsed (in the serialized format),
+keeping only the top-level definitions reachable from the script: the ones
+whose names appear in the forms that are not definitions, or (transitively)
+in the reachable definitions. The forms of the load guards of the libraries
+are taken as top-level ones, since a bundle has each file once. Names are
+found syntactically, in any part of the expressions (quoted or not), so a
+definition is only dropped when its name doesn't appear anywhere else.
+"""
+
+import gc
+import os
+
+from .cons import car, cdr, cadr, caddr, cadddr, cddr, is_pair, is_symbol, make_list
+from .cache import load_source
+from .macro import find_file_in_path
+from . import serialize
+
+__all__ = ['collect', 'shake', 'make_bundle', 'is_bundle', 'load_bundle',
+           'run_bundle']
+
+#: the version of the bundle format
+BUNDLE_VERSION = 1
+
+def collect(path, expressions=None, included=None):
+    """
+    Returns the list of the top-level expressions of a script, in evaluation
+    order, with the top-level includes (and autoloads) replaced by the
+    expressions of the files. As include does, each file is only included
+    once.
+    """
+    expressions = [] if expressions is None else expressions
+    included = set() if included is None else included
+
+    included.add(os.path.abspath(path))
+    content_hash, program = load_source(path)
+
+    pending = list(program or ())
+    pending.reverse()
+    while pending:
+        expression = pending.pop()
+        guarded = guarded_forms(expression)
+        if guarded is not None:
+            pending.extend(reversed(list(guarded)))
+        elif (is_pair(expression) and car(expression) in ('include', 'autoload') and
+                is_pair(cdr(expression)) and cdr(cdr(expression)) is None and
+                is_symbol(cadr(expression))):
+            include_path = find_file_in_path(cadr(expression))
+            if os.path.abspath(include_path) not in included:
+                collect(include_path, expressions, included)
+        else:
+            expressions.append(expression)
+    return expressions
+
+def guarded_forms(expression):
+    """
+    The forms of a load guard, (unless (defined? <marker>) <form> ...) or
+    (if (defined? <marker>) nil (begin <form> ...)), or None
+    """
+    if not (is_pair(expression) and is_pair(cdr(expression)) and
+            is_pair(cadr(expression)) and car(cadr(expression)) == 'defined?'):
+        return None
+    if car(expression) == 'unless':
+        return cddr(expression) or ()
+    elif (car(expression) == 'if' and len(expression) == 4 and caddr(expression) == 'nil' and
+          is_pair(cadddr(expression)) and car(cadddr(expression)) == 'begin'):
+        return cdr(cadddr(expression)) or ()
+    return None
+
+def definition_name(expression):
+    "The name of a (define <symbol> <expression>) form, or None"
+    if (is_pair(expression) and car(expression) == 'define' and
+            is_pair(cdr(expression)) and is_symbol(cadr(expression))):
+        return cadr(expression)
+    return None
+
+def symbols(expression):
+    "Generates the symbols that appear in an expression"
+    stack = [expression]
+    while stack:
+        expression = stack.pop()
+        if is_pair(expression):
+            stack.append(cdr(expression))
+            stack.append(car(expression))
+        elif is_symbol(expression):
+            yield expression
+
+def shake(expressions):
+    """
+    Returns the expressions without the definitions that are not reachable
+    from the other forms, keeping their order
+    """
+    definitions = {}
+    pending = []
+    for expression in expressions:
+        name = definition_name(expression)
+        if name is None:
+            pending.append(expression)
+        else:
+            definitions.setdefault(name, []).append(expression)
+
+    reachable = set()
+    while pending:
+        for symbol in symbols(pending.pop()):
+            if symbol not in reachable and symbol in definitions:
+                reachable.add(symbol)
+                pending.extend(definitions[symbol])
+
+    return [e for e in expressions
+            if definition_name(e) is None or definition_name(e) in reachable]
+
+def make_bundle(path, output):
+    """
+    Writes the bundle of the script in path to the output path. Returns the
+    number of top-level expressions of the script (with its includes) and
+    of the bundle.
+    """
+    expressions = collect(path)
+    kept = shake(expressions)
+    with open(output, 'wb') as f:
+        serialize.dump(make_list(['bundle', BUNDLE_VERSION, make_list(kept)]), f)
+    return len(expressions), len(kept)
+
+def is_bundle(path):
+    "Whether the file is a bundle (or any other serialized scheme value)"
+    with open(path, 'rb') as f:
+        return f.read(len(serialize.MAGIC)) == serialize.MAGIC
+
+def load_bundle(path):
+    "Returns the expressions of a bundle. Raises ValueError if it's not valid"
+    # the loaded structure has no cycles: see cache.load_compiled
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as f:
+            header = serialize.load(f)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if (not is_pair(header) or car(header) != 'bundle' or
+            not is_pair(cdr(header)) or cadr(header) != BUNDLE_VERSION):
+        raise ValueError("Not a bundle of version %d: %s" % (BUNDLE_VERSION, path))
+    return caddr(header)
+
+def run_bundle(path, environment):
+    "Evaluates the expressions of a bundle, returning the last result"
+    from .evaluator import evaluate_top_level
+
+    result = None
+    for expression in (load_bundle(path) or ()):
+        result = evaluate_top_level(expression, environment)
+    return result
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+"""
+On-disk caches.
+
+The results of expressions marked as pure, with the (pure <expression>)
+form, are keyed by a hash of the expression, of the top-level expressions
+of the program evaluated so far and of the content of every file included
+so far, so they're recomputed whenever any of them changes. Results that
+are lazy lists are not cached, as they may be infinite. This cache is
+opt-in: it's only used when the SCHEME_CACHE_DIR environment variable
+names a directory.
+
+The expressions of included files are compiled (i.e. stored in the
+serialized format) into a __schemecache__ directory next to the file,
+along with its modification time and size, and are read from there while
+the file doesn't change.
+"""
+
+import codecs
+import gc
+import hashlib
+import os
+import tempfile
+
+from .cons import make_list
+from . import serialize
+
+__all__ = ['NOT_FOUND', 'cache_directory', 'program_hash', 'expression_key', 'load_result',
+           'store_result', 'read_source', 'load_source']
+
+#: the version of the compiled files format
+COMPILED_VERSION = 1
+
+#: marks a missing result
+NOT_FOUND = object()
+
+def cache_directory():
+    "The directory of the results cache, or None if it's disabled"
+    return os.getenv('SCHEME_CACHE_DIR') or None
+
+def program_hash(previous, expression):
+    """
+    The hash of a program after a top-level expression, given the hash
+    before it (None for the first one)
+    """
+    digest = hashlib.sha1((previous or '').encode('ascii'))
+    digest.update(serialize.dumps(expression))
+    return digest.hexdigest()
+
+def expression_key(expression, dependencies, program=None):
+    """
+    The cache key of an expression, given the dependencies dictionary of
+    file path: content hash and the hash of the program evaluated so far.
+    Raises ValueError if the expression can't be serialized.
+    """
+    digest = hashlib.sha1(serialize.dumps(expression))
+    digest.update((program or '').encode('ascii'))
+    for path, content_hash in sorted(dependencies.items()):
+        digest.update(path.encode('utf-8'))
+        digest.update(content_hash.encode('ascii'))
+    return digest.hexdigest()
+
+def result_path(directory, key):
+    return os.path.join(directory, key + '.scmv')
+
+def load_result(directory, key):
+    "The cached result for key, or NOT_FOUND"
+    try:
+        with open(result_path(directory, key), 'rb') as f:
+            return serialize.load(f)
+    except (IOError, ValueError):
+        return NOT_FOUND
+
+def store_result(directory, key, value):
+    """
+    Stores a result in the cache. Returns False if it can't be stored, either
+    because it's not serializable (or a lazy list) or the directory is not
+    writable.
+    """
+    try:
+        data = serialize.dumps(value, force_lazy=False)
+    except ValueError:
+        return False
+    return write_file(result_path(directory, key), data)
+
+def write_file(path, data):
+    """
+    Writes the data into a file, creating its directory if needed. Returns
+    False if it can't be written.
+    """
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # write to a temporary file first, so readers never see partial data
+        fd, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(temporary, path)
+        return True
+    except (IOError, OSError):
+        return False
+
+def compiled_path(path):
+    "The path of the compiled file of a source file"
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, '__schemecache__', name + 'c')
+
+def load_compiled(path, stat):
+    """
+    The content hash and expressions of a source file from its compiled
+    file, or NOT_FOUND if it's missing or out of date
+    """
+    # the loaded structure has no cycles: pause the garbage collector, that
+    # would otherwise scan the new pairs over and over while they're created
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(compiled_path(path), 'rb') as f:
+            version, mtime, size, content_hash, expressions = serialize.load(f)
+    except (IOError, ValueError, TypeError):
+        return NOT_FOUND
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if (version, mtime, size) != (COMPILED_VERSION, stat.st_mtime, stat.st_size):
+        return NOT_FOUND
+    return content_hash, expressions
+
+def store_compiled(path, stat, content_hash, expressions):
+    "Writes the compiled file of a source file, returning whether it could"
+    try:
+        data = serialize.dumps(make_list([COMPILED_VERSION, stat.st_mtime,
+                                          stat.st_size, content_hash,
+                                          expressions]))
+    except ValueError:
+        return False
+    return write_file(compiled_path(path), data)
+
+def read_source(path):
+    """
+    Returns the content hash and the text of a scheme source file. Raises
+    IOError if the file can't be read.
+    """
+    with codecs.open(path, 'r', 'utf-8') as f:
+        source = f.read()
+    return hashlib.sha1(source.encode('utf-8')).hexdigest(), source
+
+def load_source(path):
+    """
+    Returns the content hash and the expressions of a scheme source file,
+    read from its compiled file if it's up to date. Otherwise, the source is
+    parsed and compiled. Raises IOError or OSError if the file can't be read.
+    """
+    from .evaluator import string_to_scheme
+
+    stat = os.stat(path)
+    compiled = load_compiled(path, stat)
+    if compiled is not NOT_FOUND:
+        return compiled
+
+    content_hash, source = read_source(path)
+    expressions = string_to_scheme(source)
+
+    store_compiled(path, stat, content_hash, expressions)
+    return content_hash, expressions
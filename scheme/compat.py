@@ -0,0 +1,58 @@
+# coding: utf-8
+
+"""
+The differences between Python 2 and 3 (CPython or PyPy), so the other
+modules run unchanged on both.
+"""
+
+import codecs
+from functools import reduce
+import io
+import sys
+
+__all__ = ['PY2', 'text_type', 'string_types', 'integer_types', 'symbol_types',
+           'file_types', 'xrange', 'input', 'reduce', 'unescape', 'utf8_stdin',
+           'utf8_stdout']
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    text_type = unicode
+    string_types = (str, unicode)
+    integer_types = (int, long)
+    file_types = (codecs.StreamReaderWriter, file, io.IOBase)
+    xrange = xrange
+    input = raw_input
+else:
+    text_type = str
+    string_types = (str,)
+    integer_types = (int,)
+    file_types = (codecs.StreamReaderWriter, io.IOBase)
+    xrange = range
+    input = input
+
+#: the types of the scheme symbols (and strings)
+symbol_types = string_types
+
+def unescape(value):
+    "The text of a value, with the backslash escapes of string literals replaced"
+    return codecs.escape_decode(text_type(value).encode('utf-8'))[0].decode('utf-8')
+
+def utf8_stream(stream, codec):
+    "A text stream (Python 3), read or written as utf-8 whatever its encoding"
+    encoding = getattr(stream, 'encoding', None)
+    if encoding and codecs.lookup(encoding).name == 'utf-8' or not hasattr(stream, 'buffer'):
+        return stream
+    return codec(stream.buffer)
+
+def utf8_stdin():
+    "The standard input, read as utf-8 text"
+    if PY2:
+        return codecs.getreader('utf-8')(sys.stdin)
+    return utf8_stream(sys.stdin, codecs.getreader('utf-8'))
+
+def utf8_stdout():
+    "The standard output, written as utf-8 text"
+    if PY2:
+        return codecs.getwriter('utf-8')(sys.stdout)
+    return utf8_stream(sys.stdout, codecs.getwriter('utf-8'))
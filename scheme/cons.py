@@ -1,5 +1,7 @@
 # coding: utf-8
 
+from .compat import PY2, text_type, symbol_types, integer_types
+
 class cons(object):
     """
     Implementation of the fundamental scheme data structure
@@ -15,7 +17,7 @@ class cons(object):
         current = self
         while is_pair(current):
             val = car(current)
-            if type(val) == unicode:
+            if PY2 and type(val) == text_type:
                 val = val.encode('utf-8')
 
             elements.append(pretty_print(val))
@@ -44,6 +46,38 @@ class cons(object):
     def __len__(self):
         return len(list(iter(self)))
 
+    def __reduce__(self):
+        # pickle the elements of the list (up to a lazy or improper tail) as
+        # a sequence, instead of recursing into the cdrs
+        elements = []
+        current = self
+        while current.__class__ is cons:
+            elements.append(current.first)
+            current = current.second
+        return (rebuild_list, (elements, current))
+
+class ListView(cons):
+    """
+    A pair presenting the elements of a Python iterator as a scheme list. The
+    next pair is produced only when the cdr is first accessed, and then kept,
+    so the iterator is advanced at most once per element.
+    """
+
+    def __init__(self, first, iterator):
+        self.first = first
+        self.iterator = iterator
+        self.rest = None
+
+    @property
+    def second(self):
+        if self.iterator is not None:
+            self.rest = make_view(self.iterator)
+            self.iterator = None
+        return self.rest
+
+    def __reduce__(self):
+        raise TypeError("Can't pickle a view of an iterator")
+
 def car(pair):
     if not is_pair(pair):
         raise ValueError("Not a cons: %s" % pair)
@@ -69,8 +103,8 @@ quote = lambda x: cons('quote', cons(x))
 is_atom   = lambda x: is_symbol(x) or type(x) in (int, float, complex, bool)
 
 #: symbol is a textual representation
-is_symbol = lambda x: type(x) in (str, unicode)
-is_pair   = lambda x: type(x) == cons
+is_symbol = lambda x: type(x) in symbol_types
+is_pair   = lambda x: isinstance(x, cons)
 is_nil    = lambda x: x is None
 
 def make_list(iterable):
@@ -78,13 +112,33 @@ def make_list(iterable):
     Build a cons list using the elements from a iterable. This uses the normal
     order of the iterable.
     """
-    def make_list_it(iterator):
-        try:
-            return cons(next(iterator), make_list_it(iterator))
-        except StopIteration:
-            return None
-
-    return make_list_it(iter(iterable))
+    head = last = None
+    for value in iterable:
+        cell = cons(value)
+        if last is None:
+            head = cell
+        else:
+            last.second = cell
+        last = cell
+    return head
+
+def rebuild_list(elements, tail):
+    "Builds the list of the elements followed by tail (e.g. when unpickled)"
+    for value in reversed(elements):
+        tail = cons(value, tail)
+    return tail
+
+def make_view(iterable):
+    """
+    Presents a Python sequence or iterator as a scheme list, without copying
+    it: the pairs are created as the list is walked through. Returns nil if
+    it's empty.
+    """
+    iterator = iter(iterable)
+    try:
+        return ListView(next(iterator), iterator)
+    except StopIteration:
+        return None
 
 def pretty_print(exp):
     """
@@ -2,12 +2,17 @@
 
 import codecs
 import operator
-import sys
+import re
 
-from cons import *
-from thunk import is_thunk
-from macro import IncludeMacro, is_macro
-from procedure import BuiltinProcedure, is_procedure
+from .compat import reduce, unescape, utf8_stdin, utf8_stdout
+from .cons import *
+from .thunk import force, is_thunk, make_stream, iter_stream
+from .macro import IncludeMacro, AutoloadMacro, is_macro
+from .procedure import *
+from .functional import *
+from .persistent import *
+from .numeric import *
+from . import serialize
 
 class Environment(dict):
     """
@@ -15,6 +20,19 @@ class Environment(dict):
     evaluation model, which can point to a higher scope environment.
     """
 
+    #: the absolute paths of the files included in this frame (a set,
+    #: created by the first include)
+    modules = None
+
+    #: the tokens of the definitions to read when their names are first
+    #: looked up in this frame, by name (a dictionary, created by the first
+    #: autoload)
+    autoloads = None
+
+    #: the hash of the top-level expressions of the program evaluated in
+    #: this frame, recorded while the results cache is enabled
+    program = None
+
     def __init__(self, parent=None):
         """
         Creates a new environment frame , optionaly, pointing to a parent
@@ -30,6 +48,8 @@ class Environment(dict):
         try:
             return super(Environment, self).__getitem__(name)
         except KeyError as e:
+            if self.autoloads and name in self.autoloads:
+                return self.load_definition(name)
             # should stop only is parent is None, {} is acceptable, as it
             # could have other parents (grandparents)
             if self.parent is not None:
@@ -37,16 +57,56 @@ class Environment(dict):
             else:
                 raise KeyError("Unbound variable %s" % name)
 
+    def autoload(self, name, tokens):
+        """
+        Binds the name to a definition to be read from its tokens (and
+        evaluated) when the name is first looked up. As a define, it replaces
+        the current binding of the name in this frame.
+        """
+        if self.autoloads is None:
+            self.autoloads = {}
+        self.autoloads[name] = tokens
+        self.pop(name, None)
+
+    def load_definition(self, name):
+        "Reads and evaluates the autoloaded definition of name, returning its value"
+        from .evaluator import full_evaluate
+        from .reader import read_expression
+
+        expression = read_expression(self.autoloads.pop(name))
+        full_evaluate(expression, self)
+        if name not in self:
+            raise ValueError("Autoloaded expression %s does not define %s" %
+                             (expression, name))
+        return super(Environment, self).__getitem__(name)
+
+    def is_included(self, path):
+        "Whether the file (absolute path) was included in this frame or a parent one"
+        environment = self
+        while environment is not None:
+            if environment.modules is not None and path in environment.modules:
+                return True
+            environment = environment.parent
+        return False
+
+    def fork(self):
+        """
+        Returns a new environment that extends this one: it sees all of its
+        bindings (and included files), shared rather than copied, but its
+        definitions and includes don't change this one.
+        """
+        return self.__class__(parent=self)
+
     def exists(self, name):
-        if name in self:
+        if name in self or self.autoloads and name in self.autoloads:
             return True
         elif self.parent is not None:
             return self.parent.exists(name)
         return False
 
     def truncated_repr(self):
-        if len(self.keys()) > 6:
-            current = "%s ..." % dict(self.items()[:5])
+        if len(self) > 6:
+            current = "%s ..." % dict(list(self.items())[:5])
         else:
             current = str(dict(self.items()))
 
@@ -64,23 +124,101 @@ class NumericEnvironment(Environment):
     def __getitem__(self, name):
         # try to transform to numeric forms
         try:
-            return int(name)
+            return parse_number(name)
+        except ValueError:
+            return super(NumericEnvironment, self).__getitem__(name)
+
+def parse_number(text):
+    """
+    Transforms a text into an integer, float or complex number, whichever fits
+    first. Raises ValueError if it's not a number.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return complex(text)
+
+def string_to_number(text):
+    "The number in text, or False if it's not a number"
+    try:
+        return parse_number(text)
+    except ValueError:
+        return False
+
+#: the first chars of the atoms that may be numbers
+NUMBER_START = frozenset('0123456789+-.')
+
+def data_atom(text):
+    "The number in an atom of a data file, or the atom itself (a symbol)"
+    if text[0] in NUMBER_START:
+        try:
+            return parse_number(text)
         except ValueError:
-            try:
-                return float(name)
-            except ValueError:
-                try:
-                    return complex(name)
-                except ValueError:
-                    return super(NumericEnvironment, self).__getitem__(name)
+            pass
+    return text
+
+def read_data_stream(port):
+    "The lazy list of the expressions in a data file, read as it's forced"
+    from .evaluator import READER
+    return make_stream(READER.data(port, data_atom))
+
+def read_data(port):
+    "The list of all the expressions in a data file"
+    from .evaluator import READER
+    return make_list(READER.data(port, data_atom))
+
+def number_to_string(number):
+    # floats repr gives the shortest text that reads back the same number
+    return repr(number) if type(number) == float else str(number)
+
+def string_index(text, substring, start=0):
+    "The index of substring in text, or False if it's not found"
+    index = text.find(substring, start)
+    return index if index >= 0 else False
+
+def regex_match(pattern, text):
+    """
+    Searches the regular expression pattern in text. Return the list of the
+    matched text followed by the groups, or False if it doesn't match.
+    """
+    match = re.search(pattern, text)
+    if match is None:
+        return False
+    return make_list((match.group(0),) + match.groups())
+
+def memoized(procedure):
+    "Returns the procedure, raising ValueError if it's not a memoized one"
+    if not is_memoized(procedure):
+        raise ValueError("Not a memoized procedure: %s" % procedure)
+    return procedure
 
+def memo_stats(procedure):
+    "The list of hits, misses and size of the cache of a memoized procedure"
+    return make_list([procedure.hits, procedure.misses, len(procedure.cache)])
+
+def dump_to_path(value, path):
+    "Serializes value into the file at path"
+    with open(path, 'wb') as f:
+        serialize.dump(value, f)
+
+def load_from_path(path):
+    "Loads a value serialized into the file at path"
+    with open(path, 'rb') as f:
+        return serialize.load(f)
 
 def make_global_environment():
     env = NumericEnvironment()
 
     # utf-8 stdin and out
-    stdin = codecs.getreader('utf-8')(sys.stdin)
-    stdout = codecs.getreader('utf-8')(sys.stdout)
+    stdin = utf8_stdin()
+    stdout = utf8_stdout()
+
+    stream_cdr = BuiltinProcedure(lambda args: force(cdar(args)), 'stream-cdr', 1, 1)
+
+    include = IncludeMacro()
 
     env.update({
             # built-in symbols
@@ -97,33 +235,104 @@ def make_global_environment():
             'pair?'  : BuiltinProcedure(lambda args: is_pair(car(args)), 'pair?', 1, 1),
             'nil?'   : BuiltinProcedure(lambda args: is_nil(car(args)), 'nil?', 1, 1),
             'eq?':     BuiltinProcedure(lambda args: car(args) is cadr(args), 'eq?', 2, 2),
-            '=':       BuiltinProcedure(lambda args: car(args) == cadr(args), '=', 2, 2),
+            '=':       BuiltinProcedure(lambda args: equal(car(args), cadr(args)), '=', 2, 2),
 
             # symbolic manipulation
             'explode': BuiltinProcedure(lambda args: make_list(list(car(args))), 'explode', 1, 1),
             'implode': BuiltinProcedure(lambda args: ''.join(iter(args)), 'implode', 1),
 
+            # string manipulation
+            'string-length': BuiltinProcedure(lambda args: len(car(args)), 'string-length', 1, 1),
+            'string-append': BuiltinProcedure(lambda args: ''.join(iter(args)) if args else '', 'string-append'),
+            'substring':     BuiltinProcedure(lambda args: car(args)[cadr(args):caddr(args) if len(args) == 3 else None], 'substring', 2, 3),
+            'string-index':  BuiltinProcedure(lambda args: string_index(*args), 'string-index', 2, 3),
+            'string-split':  BuiltinProcedure(lambda args: make_list(car(args).split(cadr(args) if len(args) == 2 else None)), 'string-split', 1, 2),
+            'string->number': BuiltinProcedure(lambda args: string_to_number(car(args)), 'string->number', 1, 1),
+            'number->string': BuiltinProcedure(lambda args: number_to_string(car(args)), 'number->string', 1, 1),
+            'regex-match':   BuiltinProcedure(lambda args: regex_match(car(args), cadr(args)), 'regex-match', 2, 2),
+            'regex-replace': BuiltinProcedure(lambda args: re.sub(car(args), caddr(args), cadr(args)), 'regex-replace', 3, 3),
+
             # basic data manipulation
             'car' :   BuiltinProcedure(lambda args: caar(args), 'car', 1, 1),
             "cdr":   BuiltinProcedure(lambda args: cdar(args), "cdr", 1, 1),
             "cons":  BuiltinProcedure(lambda args: cons(car(args), cadr(args)), "cons", 2, 2),
 
+            # lazy lists: (stream-cons a b), or (cons' a b), is a special form
+            'stream-cdr': stream_cdr,
+            "cdr'": stream_cdr,
+            'force': BuiltinProcedure(lambda args: force(car(args)), 'force', 1, 1),
+
+            # list toolkit
+            'len':    BuiltinProcedure(lambda args: length(car(args)), 'len', 1, 1),
+            'apply':  BuiltinProcedure(lambda args: apply_procedure(car(args), list(iter_stream(cadr(args)))), 'apply', 2, 2),
+            'map':    StreamProcedure(map_elements, 'map', 2, 2),
+            'filter': StreamProcedure(filter_elements, 'filter', 2, 2),
+            'take-n': StreamProcedure(take_n_elements, 'take-n', 2, 2),
+            'take-while': StreamProcedure(take_while_elements, 'take-while', 2, 2),
+            'zip':    BuiltinProcedure(lambda args: make_stream(zip_lists(list(iter(args)) if args else [])), 'zip'),
+            'join':   BuiltinProcedure(lambda args: join(car(args), cadr(args)), 'join', 2, 2),
+            'reduce': BuiltinProcedure(lambda args: reduce_list(car(args), cadr(args), caddr(args)), 'reduce', 3, 3),
+            'sort':   BuiltinProcedure(lambda args: sort_list(car(args), cadr(args)), 'sort', 2, 2),
+
+            # memoization
+            'memoize': BuiltinProcedure(lambda args: MemoizedProcedure(car(args), cadr(args) if len(args) == 2 else None), 'memoize', 1, 2),
+            'memo-clear': BuiltinProcedure(lambda args: memoized(car(args)).clear(), 'memo-clear', 1, 1),
+            'memo-stats': BuiltinProcedure(lambda args: memo_stats(memoized(car(args))), 'memo-stats', 1, 1),
+
+            # persistent maps
+            'hash-map':  BuiltinProcedure(lambda args: make_map(iter(args)) if args else PersistentMap(), 'hash-map'),
+            'hash-map?': BuiltinProcedure(lambda args: is_persistent_map(car(args)), 'hash-map?', 1, 1),
+            'hash-map-ref': BuiltinProcedure(lambda args: car(args).get(cadr(args), caddr(args) if len(args) == 3 else None), 'hash-map-ref', 2, 3),
+            'hash-map-set': BuiltinProcedure(lambda args: car(args).assoc(cadr(args), caddr(args)), 'hash-map-set', 3, 3),
+            'hash-map-remove': BuiltinProcedure(lambda args: car(args).dissoc(cadr(args)), 'hash-map-remove', 2, 2),
+            'hash-map-contains?': BuiltinProcedure(lambda args: cadr(args) in car(args), 'hash-map-contains?', 2, 2),
+            'hash-map-count': BuiltinProcedure(lambda args: len(car(args)), 'hash-map-count', 1, 1),
+            'hash-map->list': BuiltinProcedure(lambda args: make_stream(cons(k, v) for k, v in car(args).items()), 'hash-map->list', 1, 1),
+
+            # persistent vectors
+            'vector':  BuiltinProcedure(lambda args: make_vector(iter(args)) if args else PersistentVector(), 'vector'),
+            'vector?': BuiltinProcedure(lambda args: is_persistent_vector(car(args)), 'vector?', 1, 1),
+            'vector-ref': BuiltinProcedure(lambda args: car(args).nth(cadr(args)), 'vector-ref', 2, 2),
+            'vector-set': BuiltinProcedure(lambda args: car(args).assoc(cadr(args), caddr(args)), 'vector-set', 3, 3),
+            'vector-push': BuiltinProcedure(lambda args: car(args).push(cadr(args)), 'vector-push', 2, 2),
+            'vector-pop': BuiltinProcedure(lambda args: car(args).pop(), 'vector-pop', 1, 1),
+            'vector-length': BuiltinProcedure(lambda args: len(car(args)), 'vector-length', 1, 1),
+            'vector->list': BuiltinProcedure(lambda args: make_stream(car(args)), 'vector->list', 1, 1),
+            'list->vector': BuiltinProcedure(lambda args: make_vector(iter_stream(car(args))), 'list->vector', 1, 1),
+
+            # numeric arrays
+            'array':  BuiltinProcedure(lambda args: NumericArray(iter(args) if args else []), 'array'),
+            'array?': BuiltinProcedure(lambda args: is_array(car(args)), 'array?', 1, 1),
+            'array-range': BuiltinProcedure(lambda args: array_range(*args), 'array-range', 2, 3),
+            'array-ref': BuiltinProcedure(lambda args: car(args).nth(cadr(args)), 'array-ref', 2, 2),
+            'array-length': BuiltinProcedure(lambda args: len(car(args)), 'array-length', 1, 1),
+            'list->array': BuiltinProcedure(lambda args: to_array(car(args)), 'list->array', 1, 1),
+            'array->list': BuiltinProcedure(lambda args: make_stream(car(args)), 'array->list', 1, 1),
+            'sum':  BuiltinProcedure(lambda args: array_sum(car(args)), 'sum', 1, 1),
+            'mean': BuiltinProcedure(lambda args: array_mean(car(args)), 'mean', 1, 1),
+            'dot':  BuiltinProcedure(lambda args: array_dot(car(args), cadr(args)), 'dot', 2, 2),
+
             # I/O operations
-            'write': BuiltinProcedure(lambda args: stdout.write(unicode(car(args)).encode('utf-8').decode('string_escape')), 'write', 1, 1),
+            'write': BuiltinProcedure(lambda args: stdout.write(unescape(car(args))), 'write', 1, 1),
             'read' : BuiltinProcedure(lambda args: stdin.read(1), 'read', 0, 0),
             'file-open' : BuiltinProcedure(lambda args: codecs.open(car(args), cadr(args), 'utf-8'), 'file-open', 2, 2),
             'file-close': BuiltinProcedure(lambda args: car(args).close(), 'file-close', 1, 1),
-            'file-write': BuiltinProcedure(lambda args: car(args).write(unicode(cadr(args)).encode('utf-8').decode('string_escape').decode('utf-8')), 'file-write', 2, 2),
+            'file-write': BuiltinProcedure(lambda args: car(args).write(unescape(cadr(args))), 'file-write', 2, 2),
             'file-read' : BuiltinProcedure(lambda args: car(args).read(1), 'file-read', 1, 1),
+            'read-data' : BuiltinProcedure(lambda args: read_data(car(args)), 'read-data', 1, 1),
+            'read-data-stream' : BuiltinProcedure(lambda args: read_data_stream(car(args)), 'read-data-stream', 1, 1),
+            'dump': BuiltinProcedure(lambda args: dump_to_path(car(args), cadr(args)), 'dump', 2, 2),
+            'load': BuiltinProcedure(lambda args: load_from_path(car(args)), 'load', 1, 1),
 
             # dependency inclusion
-            'include' : IncludeMacro(),
+            'include' : include,
+            'autoload': AutoloadMacro(include),
 
             # arithmetic operations
             '+':   BuiltinProcedure(lambda args: reduce(operator.add, args), '+', 2),
             '-':   BuiltinProcedure(lambda args: reduce(operator.sub, args), '-', 2),
             '*':   BuiltinProcedure(lambda args: reduce(operator.mul, args), '*', 2),
-            '/':   BuiltinProcedure(lambda args: reduce(operator.div, args), '/', 2),
+            '/':   BuiltinProcedure(lambda args: reduce(divide, args), '/', 2),
             'mod': BuiltinProcedure(lambda args: reduce(operator.mod, args), 'mod', 2),
             '<' :  BuiltinProcedure(lambda args: car(args) <  cadr(args), '<',  2),
             '>' :  BuiltinProcedure(lambda args: car(args) >  cadr(args), '>',  2),
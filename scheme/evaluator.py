@@ -1,135 +1,33 @@
 # coding: utf-8
 
-import codecs
-
-from cons import *
-from thunk import Thunk, is_thunk
-from environment import Environment, make_global_environment
-from macro import Macro, is_macro
-from parser import Element, Parser
-from procedure import Procedure, is_procedure
-import lexer
+from .cons import *
+from .thunk import Thunk, is_thunk, make_stream, iter_stream
+from .functional import is_stream_procedure
+from .environment import Environment, make_global_environment
+from .macro import Macro, IncludeMacro, is_macro
+from .procedure import Procedure, is_procedure
+from . import cache
+from . import reader
+from .reader import Reader, PROGRAM, EXPRESSION
 
 __all__ = ["evaluate", "evaluate_expression"]
 
-#: Lex states constants enum
-(START, COMMENT, QUOTE, LPAREN, RPAREN, MAYBE_DOT, MAYBE_INTEGER, STRING_OPEN,
-        STRING_BODY, STRING_CLOSE, SCAPE_CHAR, SYMBOL,) = xrange(12)
-
-#: Grammar non-terminal constants enum
-(EXPRESSION, QUOTED_EXPRESSION, UNQUOTED_EXPRESSION, LIST, DOTED_EXPRESSION,
-        ATOM, PROGRAM) = xrange(7)
-
-class FileStream(object):
-
-    def __init__(self, file):
-        self.file = file
-
-    def __iter__(self):
-        for chunk in self.file:
-            for char in chunk:
-                yield char
+#: The symbols handled as special forms by the evaluator
+SPECIAL_FORMS = frozenset(['delay', 'stream-cons', "cons'", 'defined?', 'define',
+                           'quote', 'eval', 'if', 'lambda', 'macro', 'pure'])
 
-def tree_to_scheme(tree):
-    "Transforms a parsed tree to scheme"
-
-    if type(tree) == Element:
-        if tree.name == ATOM:
-            return tree.value[0].value.value
-        elif tree.name == QUOTED_EXPRESSION:
-            return quote(tree_to_scheme(tree.value[0]))
-        elif tree.name == LIST:
-            return tree_to_scheme(tree.value)
-        elif tree.name == EXPRESSION:
-            return tree_to_scheme(tree.value[0])
-        elif tree.name == PROGRAM:
-            return tree_to_scheme(tree.value)
-        else:
-            raise ValueError("Invalid parsed tree element: %s" % tree)
-    elif hasattr(tree, 'next'): # is an iterator
-        try:
-            e = next(tree)
-            if type(e) == Element and e.name == DOTED_EXPRESSION:
-                return tree_to_scheme(e.value[0])
-            else:
-                return cons(tree_to_scheme(e),
-                            tree_to_scheme(tree))
-        except StopIteration:
-            return None
-    elif hasattr(tree, '__iter__'): # is iterable
-        return tree_to_scheme(iter(tree))
-    elif tree is None:
-        return None
-    else:
-        raise ValueError("Invalid parsed tree")
+#: The reader of all scheme input
+READER = Reader()
 
-def string_to_scheme(input, start_parsing=PROGRAM):
+def string_to_scheme(input, start_parsing=PROGRAM, bulk_tokenizer=True):
     """
     Transforms a string or file input into a pair lisp's structure.
     """
+    return READER.read(input, start_parsing, bulk_tokenizer)
 
-    #: Rules for the scheme lexical analyzer
-    SCHEME_LEX_RULES = {START: lexer.State([(r"\s", START),
-                                            (r";",  COMMENT),
-                                            (r"'",  QUOTE),
-                                            (r"\(", LPAREN),
-                                            (r"\)", RPAREN),
-                                            (r"\.", MAYBE_DOT),
-                                            (r'"',  STRING_OPEN),
-                                            (r".",  SYMBOL)], discard=True),
-                        COMMENT: lexer.State([(r"\n",  START),
-                                                (r".", COMMENT)], discard=True),
-                        QUOTE: lexer.State(token='QUOTE'),
-                        LPAREN: lexer.State(token='LPAREN'),
-                        RPAREN: lexer.State(token='RPAREN'),
-                        MAYBE_DOT: lexer.State([(r"[^\(\)\s;]", SYMBOL)], token='DOT'),
-                        STRING_OPEN: lexer.State([(r'[^"\\]', STRING_BODY),
-                                                     (r'\\', SCAPE_CHAR)], discard=True),
-                        STRING_BODY: lexer.State([(r'[^"\\]', STRING_BODY),
-                                                     (r'\\', SCAPE_CHAR),
-                                                     (r'"', STRING_CLOSE)]),
-                        SCAPE_CHAR: lexer.State([(r'.', STRING_BODY)]),
-                        STRING_CLOSE: lexer.State(token='SYMBOL', discard=True),
-                        SYMBOL: lexer.State([(r"[^\(\)\s;]", SYMBOL)], token='SYMBOL')}
-
-    #: The scheme tokenizer
-    tokenizer = lexer.Tokenizer(SCHEME_LEX_RULES, start=START)
-
-    #: The scheme parser
-    parser = Parser(start=start_parsing)
-
-    with parser as p:
-        #: The scheme grammar for the parser
-        SCHEME_GRAMMAR = {PROGRAM:             p.oneOrMore(p.expression(EXPRESSION)) &
-                                               p.end(),
-
-                          EXPRESSION:          p.expression(QUOTED_EXPRESSION) |
-                                               p.expression(ATOM) |
-                                               p.expression(LIST),
-
-                          QUOTED_EXPRESSION:   p.token('QUOTE', discard=True) &
-                                               (p.expression(ATOM) |
-                                                p.expression(LIST)),
-
-                          LIST:                p.token('LPAREN', discard=True) &
-                                               p.zeroOrMore(p.expression(EXPRESSION)) &
-                                               ~p.expression(DOTED_EXPRESSION) &
-                                               p.token('RPAREN', discard=True),
-
-                          DOTED_EXPRESSION:    p.token('DOT', discard=True) &
-                                               p.expression(EXPRESSION),
-
-                          ATOM:                p.token('SYMBOL')}
-
-    parser.grammar = SCHEME_GRAMMAR
-
-    # wraps input into a file-stream if it's a file object
-    if input.__class__ in (codecs.StreamReaderWriter, file):
-        input = FileStream(input)
-    elif hasattr(input, 'iter'):
-        raise ValueError("Invalid input object")
-
-    return tree_to_scheme(parser.parse(tokenizer.tokens(input)))
+def scheme_tokens(input, bulk_tokenizer=True):
+    "Returns a generator of the scheme tokens of a string, file or iterable"
+    return READER.tokens(input, bulk_tokenizer)
 
 def evaluate_expression(input, environment=None):
     """
@@ -137,21 +35,95 @@ def evaluate_expression(input, environment=None):
     and return the result as a scheme object.
     """
     environment = make_global_environment() if environment is None else environment
-    return full_evaluate(string_to_scheme(input, start_parsing=EXPRESSION),
-                         environment)
+    return evaluate_top_level(string_to_scheme(input, start_parsing=EXPRESSION),
+                              environment)
 
-def evaluate(input, environment=None):
+def evaluate(input, environment=None, streaming=False):
     """
     evaluate a string or file object in the scheme evaluator as a program, and
-    return the result as a scheme object.
+    return the result as a scheme object. In streaming mode, each top-level
+    expression is evaluated as soon as it's read, and before the next one is
+    read, so the input may be unbounded (e.g. a pipe).
     """
     environment = make_global_environment() if environment is None else environment
+    if streaming:
+        result = None
+        for expression in reader.iter_program(scheme_tokens(input)):
+            result = evaluate_top_level(expression, environment)
+        return result
+
     expressions = string_to_scheme(input)
 
     for expression in expressions:
+        result = evaluate_top_level(expression, environment)
+    return result
+
+def evaluate_top_level(expression, environment):
+    """
+    Evaluates a top-level expression of a program. While the results cache
+    is enabled, it's first added to the program hash of the environment,
+    which is part of the keys of the pure results.
+    """
+    if cache.cache_directory() is not None:
+        environment.program = cache.program_hash(environment.program, expression)
+    return full_evaluate(expression, environment)
+
+def program_hash(environment):
+    "The program hash of the nearest frame that has one, or None"
+    while environment is not None:
+        if environment.program is not None:
+            return environment.program
+        environment = environment.parent
+    return None
+
+def evaluate_pure(expression, environment):
+    """
+    Evaluates an expression whose result only depends on the program and
+    the files included so far. If the results cache is enabled (see the
+    cache module), the result is read from there, or evaluated and stored.
+    """
+    directory = cache.cache_directory()
+    if directory is None:
+        return full_evaluate(expression, environment)
+
+    include = environment['include'] if environment.exists('include') else None
+    dependencies = include.dependencies if isinstance(include, IncludeMacro) else {}
+    try:
+        key = cache.expression_key(expression, dependencies,
+                                   program_hash(environment))
+    except ValueError:
+        return full_evaluate(expression, environment)
+
+    result = cache.load_result(directory, key)
+    if result is cache.NOT_FOUND:
         result = full_evaluate(expression, environment)
+        cache.store_result(directory, key, result)
     return result
 
+def stream_elements(operator, unev_operands, environment):
+    """
+    Applies a stream procedure to the unevaluated operands, returning the
+    generator of the resulting elements. If the last operand (the source
+    list) is itself an application of a stream procedure, both are fused:
+    the stages are chained directly, without building the intermediate list.
+    """
+    operands = list(iter(unev_operands)) if unev_operands else []
+    operator.check_arguments(len(operands))
+    arguments = [full_evaluate(e, environment) for e in operands[:-1]]
+
+    source = operands[-1]
+    head = car(source) if is_pair(source) else None
+    source_operator = None
+    if is_symbol(head) and head not in SPECIAL_FORMS and environment.exists(head):
+        source_operator = full_evaluate(head, environment)
+
+    if is_stream_procedure(source_operator):
+        elements = stream_elements(source_operator, cdr(source), environment)
+    else:
+        elements = iter_stream(full_evaluate(source, environment))
+
+    return operator.stage(*(arguments + [elements]))
+
 def full_evaluate(expression, environment):
     """
     Fully evaluate an expression until its basic representation
@@ -160,9 +132,12 @@ def full_evaluate(expression, environment):
     while True:
         if is_thunk(expression):
             if not expression.is_evaluated:
+                value = full_evaluate(expression.expression,
+                                      expression.environment)
+                # memoize the value, and release the environment
+                expression.expression = value
+                expression.environment = None
                 expression.is_evaluated = True
-                expression.expression = full_evaluate(expression.expression,
-                                                      expression.environment)
             return expression.expression
         elif is_symbol(expression):
             expression = environment[expression]
@@ -178,6 +153,12 @@ def full_evaluate(expression, environment):
                 raise SyntaxError("Unexpected delay form: %s. Should be (delay <expression>)" %
                                   expression)
             return Thunk(cadr(expression), environment)
+        elif car(expression) in ('stream-cons', "cons'"):
+            if len(expression) != 3:
+                raise SyntaxError("Unexpected %s form: %s. Should be (%s <expression> <expression>)" %
+                                  (car(expression), expression, car(expression)))
+            return cons(full_evaluate(cadr(expression), environment),
+                        Thunk(caddr(expression), environment))
         elif car(expression) == 'defined?':
             if len(expression) != 2:
                 raise SyntaxError("Unexpected defined? form: %s. Should be (defined? <symbol>)" %
@@ -202,6 +183,11 @@ def full_evaluate(expression, environment):
                 raise SyntaxError("Unexpected quote form: %s. Should be (quote <expression>)" %
                                   expression)
             return cadr(expression)
+        elif car(expression) == 'pure':
+            if len(expression) != 2:
+                raise SyntaxError("Unexpected pure form: %s. Should be (pure <expression>)" %
+                                  expression)
+            return evaluate_pure(cadr(expression), environment)
         elif car(expression) == 'eval':
             if len(expression) != 2:
                 raise SyntaxError("Unexpected eval form: %s. Should be (eval <expression>)" %
@@ -221,7 +207,8 @@ def full_evaluate(expression, environment):
                                   expression)
             parameters = cadr(expression)
             if is_pair(parameters):
-                current = parameters
+                # (() . <symbol>) takes zero or more arguments
+                current = cdr(parameters) if is_nil(car(parameters)) else parameters
                 while is_pair(current):
                     if not is_symbol(car(current)):
                         raise SyntaxError("Lambda parameters should be symbols. In %s" %
@@ -263,7 +250,7 @@ def full_evaluate(expression, environment):
 
             if is_macro(operator):
                 # evaluate recursively only the inner expressions (not the last)
-                current = operator.transform(expression)
+                current = operator.transform(expression, environment)
                 while cdr(current) is not None:
                     full_evaluate(car(current), environment)
                     current = cdr(current)
@@ -273,7 +260,11 @@ def full_evaluate(expression, environment):
                 # The unevaluated operands
                 unev_operands = cdr(expression)
 
-                if callable(operator):
+                if is_stream_procedure(operator):
+                    # fuse chains of stream procedures into one lazy list
+                    return make_stream(stream_elements(operator, unev_operands,
+                                                       environment))
+                elif callable(operator):
                     # evaluate each operand recursively
                     operands = [full_evaluate(e, environment) for e in unev_operands] if unev_operands else []
                     # return the application of the built-in procedure
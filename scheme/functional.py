@@ -0,0 +1,122 @@
+# coding: utf-8
+
+"""
+Native implementations of the list toolkit of lib/functional.scm. The
+procedures that build lists are lazy in the same way as their scheme
+counterparts: they return a list whose first element is already computed,
+and whose (delayed) cdr computes the next element only when forced.
+"""
+
+from .cons import *
+from .procedure import BuiltinProcedure, apply_procedure
+from .thunk import force, promise, make_stream, iter_stream
+
+__all__ = ['StreamProcedure', 'is_stream_procedure', 'length', 'map_elements',
+           'filter_elements', 'take_n_elements', 'take_while_elements',
+           'zip_lists', 'join', 'reduce_list', 'sort_list']
+
+class StreamProcedure(BuiltinProcedure):
+    """
+    A built-in procedure that lazily transforms a list given as its last
+    argument. It's defined by a generator function (a stage) that receives
+    the other arguments and an iterator over the list elements. The evaluator
+    fuses nested applications of stream procedures into a single chain of
+    stages, so the intermediate lists are never built.
+    """
+
+    def __init__(self, stage, name, min_args=None, max_args=None):
+        super(StreamProcedure, self).__init__(self.apply_stage, name,
+                                              min_args, max_args)
+        self.stage = stage
+
+    def apply_stage(self, args):
+        arguments = list(iter(args))
+        arguments[-1] = iter_stream(arguments[-1])
+        return make_stream(self.stage(*arguments))
+
+is_stream_procedure = lambda x: isinstance(x, StreamProcedure)
+
+def length(l):
+    "The number of elements of a list, forcing it entirely"
+    n = 0
+    for _ in iter_stream(l):
+        n += 1
+    return n
+
+def map_elements(procedure, elements):
+    for element in elements:
+        yield apply_procedure(procedure, (element,))
+
+def filter_elements(procedure, elements):
+    for element in elements:
+        if apply_procedure(procedure, (element,)):
+            yield element
+
+def take_n_elements(n, elements):
+    if n <= 0:
+        return
+    for element in elements:
+        yield element
+        n -= 1
+        if n == 0:
+            # don't advance the source beyond the last taken element
+            return
+
+def take_while_elements(procedure, elements):
+    for element in elements:
+        if not apply_procedure(procedure, (element,)):
+            return
+        yield element
+
+def zip_lists(lists):
+    "Generates lists with the n-th elements of each list, up to the shortest"
+    if not lists:
+        return
+    iterators = [iter_stream(l) for l in lists]
+    while True:
+        row = []
+        for iterator in iterators:
+            try:
+                row.append(next(iterator))
+            except StopIteration:
+                return
+        yield make_list(row)
+
+def join(x, y):
+    "Lazily appends the list y to the list x (y itself is not copied)"
+    if not is_pair(x):
+        return y
+    return cons(car(x), promise(lambda: join(force(cdr(x)), y)))
+
+def reduce_list(procedure, initial, l):
+    "Left fold of the list, starting with the initial value"
+    result = initial
+    for element in iter_stream(l):
+        result = apply_procedure(procedure, (result, element))
+    return result
+
+class SortKey(object):
+    """
+    Orders values as the old lib/functional.scm sort did: an element comes
+    after the others for which (cmp element other) holds
+    """
+    __slots__ = ('value', 'cmp')
+
+    def __init__(self, value, cmp):
+        self.value = value
+        self.cmp = cmp
+
+    def __lt__(self, other):
+        return bool(apply_procedure(self.cmp, (other.value, self.value)))
+
+def sort_list(l, cmp):
+    """
+    Sorts the list (O(n log n)), comparing elements with the procedure cmp.
+    As the quicksort of lib/functional.scm did, equal elements (neither
+    comes after the other) are in the reverse order of the list: the
+    reversed list is sorted stably.
+    """
+    keys = [SortKey(element, cmp) for element in iter_stream(l)]
+    keys.reverse()
+    keys.sort()
+    return make_list(key.value for key in keys)
@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+Environment images. An image is a snapshot of an environment (e.g. the
+global environment after including the libraries), pickled with everything
+it references: definitions, procedures, macros and evaluated values. The
+built-in procedures are written by name, and are re-linked to the ones of a
+new global environment when the image is loaded. Values that can't be
+pickled (e.g. lazy lists made by built-in procedures, that hold Python
+generators) can't be saved.
+
+The pickled classes are referenced by their module in the scheme package.
+Images are written with the highest pickle protocol of the interpreter, so
+an image saved by Python 3 can't be loaded by Python 2.
+"""
+
+import gc
+import io
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .compat import PY2
+from .environment import make_global_environment
+from .procedure import BuiltinProcedure, is_memoized
+
+__all__ = ['save_image', 'load_image']
+
+#: prefix of every image file (format name and version)
+IMAGE_MAGIC = b'PSCMIMG\x01'
+
+def is_builtin(value):
+    "Whether the value is a built-in procedure (memoized procedures are not)"
+    return isinstance(value, BuiltinProcedure) and not is_memoized(value)
+
+def builtin_procedures(environment):
+    "The built-in procedures of a global environment, by name"
+    return dict((value.name, value) for value in environment.values()
+                if is_builtin(value))
+
+def make_pickler(buffer, persistent_id):
+    "A pickler that writes a value by the id persistent_id returns (if not None)"
+    if PY2:
+        pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+        return pickler
+
+    # the methods of the Python 3 picklers can't be set on the instances
+    class Pickler(pickle.Pickler):
+        pass
+    Pickler.persistent_id = staticmethod(persistent_id)
+    return Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+
+def make_unpickler(f, persistent_load):
+    "An unpickler that reads the values written by id with persistent_load"
+    if PY2:
+        unpickler = pickle.Unpickler(f)
+        unpickler.persistent_load = persistent_load
+        return unpickler
+
+    class Unpickler(pickle.Unpickler):
+        pass
+    Unpickler.persistent_load = staticmethod(persistent_load)
+    return Unpickler(f)
+
+def save_image(environment, path):
+    """
+    Writes the image of the environment into the file at path. Raises
+    ValueError if some value can't be saved.
+    """
+    names = builtin_procedures(make_global_environment())
+
+    def persistent_id(value):
+        if is_builtin(value) and value.name in names:
+            return value.name
+        return None
+
+    buffer = io.BytesIO()
+    buffer.write(IMAGE_MAGIC)
+    pickler = make_pickler(buffer, persistent_id)
+    try:
+        pickler.dump(environment)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise ValueError("Could not save the image of the environment: %s" % e)
+
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+
+def load_image(path):
+    """
+    Reads an environment from the image in the file at path, linked to the
+    built-in procedures of a new global environment. Raises ValueError if
+    it's not a valid image.
+    """
+    procedures = builtin_procedures(make_global_environment())
+
+    def persistent_load(name):
+        try:
+            return procedures[name]
+        except KeyError:
+            raise ValueError("Unknown built-in procedure in image: %s" % name)
+
+    # pause the garbage collector while the objects are created, as
+    # cache.load_compiled does
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(IMAGE_MAGIC)) != IMAGE_MAGIC:
+                raise ValueError("Not an image file: %s" % path)
+            unpickler = make_unpickler(f, persistent_load)
+            try:
+                return unpickler.load()
+            except (pickle.UnpicklingError, EOFError, AttributeError,
+                    ImportError, IndexError) as e:
+                raise ValueError("Invalid image file %s: %s" % (path, e))
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -7,7 +7,9 @@ rules
 
 import re
 
-__all__ = ["State", "Tokenizer"]
+from .compat import PY2, text_type, string_types, xrange
+
+__all__ = ["State", "Tokenizer", "PatternTokenizer"]
 
 class State(object):
     """
@@ -43,6 +45,7 @@ class Token(object):
     """
     A representation of a Token.
     """
+    __slots__ = ('value', 'type', 'line', 'column')
 
     def __init__(self, value, type='ANY', line=None, column=None):
         if type == 'STRING':
@@ -65,8 +68,10 @@ class Token(object):
     def __nonzero__(self):
         return bool(self.value)
 
+    __bool__ = __nonzero__
+
     def __repr__(self):
-        if type(self.value) == unicode:
+        if PY2 and type(self.value) == text_type:
             val = self.value.encode('utf-8')
         else:
             val = self.value
@@ -74,7 +79,11 @@ class Token(object):
 
 class Tokenizer(object):
     """
-    The finite state automata machine.
+    The finite state automata machine. The rules of the states are compiled
+    into a dense transition table, indexed by state and character class (the
+    characters that have the same transitions in every state belong to the
+    same class). Runs of characters that keep the machine in the same state
+    are consumed at once.
     """
 
     def __init__(self, states, start):
@@ -86,63 +95,284 @@ class Tokenizer(object):
         self.states = states
         self.start = self.states[start]
 
+        # number the states: the table rows, token and discard flags are
+        # indexed by those numbers
+        self.names = list(states)
+        self.numbers = dict((name, number) for number, name in enumerate(self.names))
+        self.tokens_of = [states[name].token for name in self.names]
+        self.discards = [states[name].discard for name in self.names]
+        self.runs = [self.run_matcher(name) for name in self.names]
+        self.start_number = self.numbers[start]
+
+        #: the transition table: a list of next state numbers (or -1) by
+        #: character class, for every state
+        self.table = [[] for _ in self.names]
+
+        #: the character classes, by character and by transitions signature
+        self.classes = {}
+        self.signatures = {}
+
+        for code in xrange(128):
+            self.classify(chr(code))
+
+    def classify(self, char):
+        "Returns the class number of a character, adding a new class if needed"
+        signature = tuple(self.states[name].match(char) for name in self.names)
+        klass = self.signatures.get(signature)
+
+        if klass is None:
+            klass = self.signatures[signature] = len(self.signatures)
+            for row, next_state in zip(self.table, signature):
+                row.append(-1 if next_state is None else self.numbers[next_state])
+
+        self.classes[char] = klass
+        return klass
+
+    def run_matcher(self, name):
+        """
+        Returns the match method of a regular expression that matches the
+        longest run of characters that don't leave the state, or None if the
+        state has no transitions to itself
+        """
+        alternatives = []
+        previous = []
+        for regexp, next_state in self.states[name].transitions:
+            if next_state == name:
+                # the char matches this rule, and none of the previous ones
+                alternatives.append(''.join('(?!%s)' % p for p in previous) +
+                                    '(?=%s)[\\s\\S]' % regexp.pattern)
+            previous.append(regexp.pattern)
+
+        if not alternatives:
+            return None
+        return re.compile('(?:%s)+' % '|'.join(alternatives)).match
+
     def tokens(self, text):
         """
         Analizes the input text and returns a generator that one can iterate over
-        the matched tokens. Raises a SyntaxError if the machine encouters an
-        unexpected character.
+        the matched tokens. The text may be a string or any iterable of
+        strings (e.g. characters, or chunks read from a file). Raises a
+        SyntaxError if the machine encouters an unexpected character.
         """
-        current = self.start
+        table = self.table
+        classes = self.classes
+        tokens_of = self.tokens_of
+        discards = self.discards
+        runs = self.runs
+
+        start = current = self.start_number
 
         token_buffer = []
         line = 1
         column = 1
 
-        for char in text:
-            # while matching with the same char...
-            while True:
-                next_state = current.match(char)
+        for chunk in ((text,) if isinstance(text, string_types) else text):
+            i = 0
+            length = len(chunk)
+
+            while i < length:
+                char = chunk[i]
+                klass = classes.get(char)
+                if klass is None:
+                    klass = self.classify(char)
+                next_state = table[current][klass]
 
                 # if no next state matches
-                if next_state is None:
+                if next_state < 0:
                     # if current state is final
-                    if current.token:
+                    if tokens_of[current]:
                         # yield the token accumulated in buffer and clear buffer
-                        yield Token(''.join(token_buffer), current.token, line, column)
+                        yield Token(''.join(token_buffer), tokens_of[current], line, column)
                         token_buffer = []
 
-                        # restart automata
-                        current = self.start
-
-                        # matching this char again
-                        consume = False
+                        # restart automata, matching this char again
+                        current = start
+                        continue
                     else:
                         # current token is not final, and char doesn't match!
                         raise SyntaxError('unexpected char at line: %d, column: %d: "%s"' % (line, column, char))
+
+                # consume all the chars that stay in the next state at once
+                match = runs[next_state] and runs[next_state](chunk, i + 1)
+                if match:
+                    end = match.end()
+                    run = chunk[i:end]
+                    newlines = run.count('\n')
+                    if newlines:
+                        line += newlines
+                        column = end - chunk.rfind('\n', i, end)
+                    else:
+                        column += end - i
+                    i = end
                 else:
-                    # goto next state and acumulated token buffer
-                    current = self.states[next_state]
-                    if not current.discard:
-                        token_buffer.append(char)
+                    run = char
+                    if char == '\n':
+                        line += 1
+                        column = 1
+                    else:
+                        column += 1
+                    i += 1
+
+                # goto next state and acumulated token buffer
+                current = next_state
+                if not discards[current]:
+                    token_buffer.append(run)
+
+        # try to recognize the last token, if there's buffer (or it's a
+        # token whose chars are all discarded, e.g. an empty string)
+        if token_buffer or tokens_of[current]:
+            if tokens_of[current]:
+                # yield the token accumulated in buffer
+                yield Token(''.join(token_buffer), tokens_of[current], line, column)
+            else:
+                raise SyntaxError('unexpected end of stream line: %d, column: %d' % (line, column))
+
+class PatternTokenizer(object):
+    """
+    A tokenizer that scans whole chunks of input at once, with a single
+    regular expression that combines the patterns of all tokens as named
+    groups. Tokens may span chunks: a match that reaches the end of the
+    buffered input is only accepted after the next chunk is read (or at the
+    end of input). Text that matches no pattern is an error as soon as more
+    input follows it, unless it may be the beginning of a token (an open
+    string, for instance). The tokens are located as with Tokenizer: the
+    line and column right after their last char.
+    """
 
-                    # consume char - match next char
-                    consume = True
+    def __init__(self, patterns, chunk_size=1 << 16, partial=None):
+        """
+        Creates a new tokenizer with the given patterns, a list of tuples in
+        the format (<regexp>, <token name>), tried in order. The token name
+        may be None to discard the matched text (e.g. whitespace). If the
+        regexp has a group, the token value is the text of the (first) group.
+        The optional partial regexp matches the (longest) beginnings of
+        tokens that no pattern matches until more input is read (e.g. an
+        unterminated string): unmatched text is only kept for the next chunk
+        if partial matches all of it. Otherwise the error is reported where
+        the partial match ends, as Tokenizer does.
+        """
+        self.chunk_size = chunk_size
+        self.partial = re.compile(partial) if partial else None
 
-                if consume:
+        #: the token name and the group of its value, by group index
+        self.kinds = {}
+        groups = []
+        index = 1
+        for number, (regexp, token) in enumerate(patterns):
+            groups.append('(?P<t%d>%s)' % (number, regexp))
+            self.kinds[index] = (token, index + 1 if re.compile(regexp).groups else index)
+            index += 1 + re.compile(regexp).groups
+
+        self.pattern = re.compile('|'.join(groups))
+
+    def chunks(self, input):
+        "Generates the chunks of a string, file object, or iterable of strings"
+        if isinstance(input, string_types):
+            yield input
+        elif hasattr(input, 'read'):
+            while True:
+                chunk = input.read(self.chunk_size)
+                if not chunk:
                     break
+                yield chunk
+        else:
+            for chunk in input:
+                yield chunk
+
+    def tokens(self, input):
+        """
+        Analizes the input (a string, file object or iterable of strings) and
+        returns a generator that one can iterate over the matched tokens.
+        Raises a SyntaxError if some text doesn't match any pattern.
+        """
+        kinds = self.kinds
+        finditer = self.pattern.finditer
+        partial = self.partial
+        chunks = self.chunks(input)
+
+        pending = []    # the chunks not scanned yet (after the last token)
+        size = 0        # the length of the pending chunks
+        wanted = 0      # the size to read before scanning the pending chunks
+        offset = 0      # the input position of the first pending char
+        line = 1
+        line_start = 0  # the input position where the current line starts
+        at_end = False
 
-            # count lines and columns
-            if char == '\n':
-                line += 1
-                column = 1
+        while not at_end:
+            chunk = next(chunks, None)
+            if chunk is None:
+                at_end = True
             else:
-                column += 1
+                pending.append(chunk)
+                size += len(chunk)
+                if size < wanted and not chunk[-1:].isspace():
+                    continue
+            text = ''.join(pending)
 
-        # try to recognize the last token, if there's buffer
-        if token_buffer:
-            if current.token:
-                # yield the token accumulated in buffer
-                yield Token(''.join(token_buffer), current.token, line, column)
+            position = counted = 0  # newlines are counted up to text[counted]
+            end = len(text)
+            count = text.count
+            unmatched = False
+            for match in finditer(text):
+                start, stop = match.span()
+
+                # stop at unmatched text, or a token that may go on in the
+                # next chunk
+                if start != position:
+                    unmatched = True
+                    break
+                if stop == end and not at_end:
+                    break
+                position = stop
+
+                token, group = kinds[match.lastindex]
+                if token:
+                    newlines = count('\n', counted, stop)
+                    if newlines:
+                        line += newlines
+                        line_start = offset + text.rfind('\n', counted, stop) + 1
+                    counted = stop
+                    yield Token(match.group(group), token, line, offset + stop - line_start + 1)
             else:
-                raise SyntaxError('unexpected end of stream line: %d, column: %d' % (line, column))
+                unmatched = position < end
+
+            # count the newlines of the discarded text
+            newlines = count('\n', counted, position)
+            if newlines:
+                line += newlines
+                line_start = offset + text.rfind('\n', counted, position) + 1
+
+            # unmatched text is only read on if it may begin a token
+            if unmatched:
+                match = partial and partial.match(text, position)
+                failed = match.end() if match else position
+                if at_end or failed < end:
+                    self.fail(text, position, failed, line, offset + position - line_start + 1)
+
+            # the text left (a token that may go on, or the beginning of one)
+            # is scanned again once the input read after it is as long as
+            # itself (or ends in a space, as the lines typed in the repl do),
+            # so long tokens are not scanned once per chunk
+            text = text[position:]
+            offset += position
+            pending = [text] if text else []
+            size = len(text)
+            wanted = 2 * size
+
+    def fail(self, text, position, failed, line, column):
+        """
+        Raises the SyntaxError of the text that failed to match at failed
+        (the end of the text, or the char that can't go on), scanned from
+        position, which is at the line and column given
+        """
+        newlines = text.count('\n', position, failed)
+        if newlines:
+            line += newlines
+            column = failed - text.rfind('\n', position, failed)
+        else:
+            column += failed - position
 
+        if failed == len(text):
+            raise SyntaxError('unexpected end of stream line: %d, column: %d' % (line, column))
+        raise SyntaxError('unexpected char at line: %d, column: %d: "%s"' %
+                          (line, column, text[failed]))
@@ -1,11 +1,11 @@
 # coding: utf-8
 
-import codecs
 import os
 
-from cons import *
+from .cons import *
+from .cache import load_source, read_source
 
-__all__ = ['Macro', 'is_macro']
+__all__ = ['Macro', 'IncludeMacro', 'AutoloadMacro', 'is_macro']
 
 class Macro(object):
     """
@@ -26,11 +26,12 @@ class Macro(object):
         self.reserved_words = set() if not reserved_words else reserved_words
         self.name = name
 
-    def transform(self, expression):
+    def transform(self, expression, environment=None):
         """
         Applies the macro in the expression, and return the transformed
         expression. This method assumes that the expression head matches
-        the macro
+        the macro. The environment where the expression is being evaluated
+        is not used by the rules.
         """
         for pattern, form in self.rules:
             # match_pattern retuns a dictionary of variables and matched
@@ -50,26 +51,232 @@ class Macro(object):
             return "<%d-rule macro>" % len(self.rules)
 
 class IncludeMacro(Macro):
+    """
+    Includes the expressions of a file, looked up in SCHEME_PATH. Each file
+    is loaded once per environment: the files included are registered in
+    the environment (by absolute path), and including them again, there or
+    in an environment that extends it, evaluates to nil without reading
+    them. A file whose expressions fail to evaluate is not registered, so
+    it's read again the next time it's included.
+    """
 
     def __init__(self, name='include'):
         super(IncludeMacro, self).__init__(None, name=name)
 
-    def transform(self, expression):
-        from evaluator import string_to_scheme
+        #: the content hash of every included file, by absolute path
+        self.dependencies = {}
 
+        #: the absolute paths of the files found, by SCHEME_PATH and the
+        #: absolute path of the name
+        self.resolved = {}
+
+    def transform(self, expression, environment=None):
         variables = match_pattern(cons('include', cons('path')),
                                   expression)
         if variables:
+            key = (os.getenv('SCHEME_PATH', '.'), os.path.abspath(variables['path']))
+            if environment is not None and environment.is_included(self.resolved.get(key)):
+                return cons(None)
+
             path = find_file_in_path(variables['path'])
+            absolute_path = os.path.abspath(path)
+            if environment is not None and environment.is_included(absolute_path):
+                self.resolved[key] = absolute_path
+                return cons(None)
+
             try:
-                with codecs.open(path, 'r', 'utf-8') as f:
-                    return string_to_scheme(f)
-            except IOError:
-                raise ValueError("Could not open file %s to include" % path)
+                content_hash, expressions = self.load(path, environment)
+            except (IOError, OSError):
+                raise ValueError("Could not open file %s to %s" % (path, self.name))
+
+            self.dependencies[absolute_path] = content_hash
+            self.resolved[key] = absolute_path
+            if environment is None:
+                return expressions
+
+            # registered before the expressions are evaluated, so files that
+            # include each other are not included again
+            if environment.modules is None:
+                environment.modules = set()
+            environment.modules.add(absolute_path)
+            return cons(cons(self.evaluation(absolute_path, expressions, environment)))
         else:
             raise ValueError("Expression %s does not match macro %s" %
                              (expression, self.name))
 
+    def evaluation(self, path, expressions, environment):
+        """
+        Returns a built-in procedure that evaluates the expressions of the
+        file at path, and returns the value of the last one. If some of them
+        fails, the file is no longer registered as included.
+        """
+        def evaluate(args):
+            from .evaluator import full_evaluate
+
+            result = None
+            try:
+                for expression in (expressions or ()):
+                    result = full_evaluate(expression, environment)
+            except:
+                environment.modules.discard(path)
+                raise
+            return result
+
+        return evaluate
+
+    def load(self, path, environment):
+        "Returns the content hash and the expressions of the file to include"
+        return load_source(path)
+
+class AutoloadMacro(IncludeMacro):
+    """
+    Includes a file lazily: its top-level (define <symbol> <expression>)
+    forms are only read and evaluated when the symbol is first looked up in
+    the environment (see Environment.autoload); the other expressions are
+    evaluated at once. The forms of a load guard, as the libraries have
+    ((unless (defined? <marker>) <form> ...) or
+    (if (defined? <marker>) nil (begin <form> ...))), are handled as the
+    top-level ones if the marker is not defined. It shares the registry of
+    files and their dependencies with the include macro.
+    """
+
+    #: the top-level forms of the files autoloaded by this process, by
+    #: absolute path: (modification time, size, content hash, forms). The
+    #: forms are (name, tokens) tuples for the definitions, Guard objects for
+    #: the load guards, and expressions for the others.
+    sources = {}
+
+    def __init__(self, include, name='autoload'):
+        super(AutoloadMacro, self).__init__(name=name)
+        self.dependencies = include.dependencies
+        self.resolved = include.resolved
+
+    def load(self, path, environment):
+        content_hash, forms = self.split_source(path)
+        expressions = self.expressions(forms, environment)
+        if environment is not None:
+            # the autoload evaluates to nil, not to a binding application
+            expressions.append(None)
+        return content_hash, make_list(expressions)
+
+    def expressions(self, forms, environment):
+        """
+        Returns the expressions to evaluate for the split forms of a file:
+        applications that bind the names of the definitions, and of the
+        guards, when they're evaluated (in order with the other expressions).
+        Without an environment, the definitions and guards are read back as
+        plain expressions.
+        """
+        from .reader import read_expression
+
+        def autoload(name, tokens):
+            return cons(lambda args: environment.autoload(name, tokens))
+
+        def guarded(guard):
+            def evaluate(args):
+                from .evaluator import full_evaluate
+                if not environment.exists(guard.marker):
+                    for expression in self.expressions(guard.forms, environment):
+                        full_evaluate(expression, environment)
+            return cons(evaluate)
+
+        expressions = []
+        for form in forms:
+            if form.__class__ is tuple:
+                expressions.append(autoload(*form) if environment is not None
+                                   else read_expression(form[1]))
+            elif is_guard(form):
+                expressions.append(guarded(form) if environment is not None
+                                   else read_expression(form.tokens))
+            else:
+                expressions.append(form)
+        return expressions
+
+    def split_source(self, path):
+        """
+        Returns the content hash and the top-level forms of a file, splitting
+        it unless it didn't change since the last time
+        """
+        from .evaluator import scheme_tokens
+        from .reader import split_program
+
+        stat = os.stat(path)
+        absolute_path = os.path.abspath(path)
+        cached = self.sources.get(absolute_path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2:]
+
+        content_hash, source = read_source(path)
+        forms = split_forms(split_program(scheme_tokens(source)))
+
+        self.sources[absolute_path] = (stat.st_mtime, stat.st_size, content_hash, forms)
+        return content_hash, forms
+
+class Guard(object):
+    """
+    A load guard, split as the top-level forms of a file: the marker, the
+    split forms it guards, and its tokens
+    """
+
+    __slots__ = ('marker', 'forms', 'tokens')
+
+    def __init__(self, marker, forms, tokens):
+        self.marker = marker
+        self.forms = forms
+        self.tokens = tokens
+
+is_guard = lambda x: isinstance(x, Guard)
+
+def split_forms(expressions):
+    """
+    Splits the tokens of the expressions (lists of tokens) of a file into
+    (name, tokens) tuples for the definitions, Guard objects for the load
+    guards, and expressions (already read) for the others
+    """
+    from .reader import split_program, read_expression
+
+    forms = []
+    for tokens in expressions:
+        if (len(tokens) > 3 and tokens[0].type == 'LPAREN' and
+                tokens[1].type == 'SYMBOL' and tokens[1].value == 'define' and
+                tokens[2].type == 'SYMBOL'):
+            forms.append((tokens[2].value, tokens))
+            continue
+
+        guard = guard_tokens(tokens)
+        if guard is not None:
+            marker, body = guard
+            forms.append(Guard(marker, split_forms(split_program(body)), tokens))
+        else:
+            forms.append(read_expression(tokens))
+    return forms
+
+def guard_tokens(tokens):
+    """
+    Returns the marker and the tokens of the guarded forms if the tokens are
+    of a load guard: (unless (defined? <marker>) <form> ...) or
+    (if (defined? <marker>) nil (begin <form> ...)). Otherwise None.
+    """
+    from .reader import split_program
+
+    values = [(token.type, token.value) for token in tokens[:9]]
+    if (len(tokens) < 7 or values[2:4] != [('LPAREN', '('), ('SYMBOL', 'defined?')] or
+            values[4][0] != 'SYMBOL' or values[5][0] != 'RPAREN'):
+        return None
+
+    # incomplete forms are read (and fail) as a whole
+    types = [token.type for token in tokens]
+    if types.count('LPAREN') != types.count('RPAREN'):
+        return None
+
+    if values[:2] == [('LPAREN', '('), ('SYMBOL', 'unless')]:
+        return values[4][1], tokens[6:-1]
+    elif (values[:2] == [('LPAREN', '('), ('SYMBOL', 'if')] and len(tokens) > 10 and
+          values[6:9] == [('SYMBOL', 'nil'), ('LPAREN', '('), ('SYMBOL', 'begin')] and
+          len(list(split_program(tokens[7:-1]))) == 1):
+        return values[4][1], tokens[9:-2]
+    return None
+
 def find_file_in_path(filename):
     paths = os.getenv('SCHEME_PATH', '.').split(':')
     for path in paths:
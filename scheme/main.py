@@ -1,16 +1,29 @@
 #! /usr/bin/env python
 # coding: utf-8
 
+from __future__ import print_function
+
 import atexit
 import codecs
+import importlib
 import os
 import readline
 import re
 import sys
 
-from cons import pretty_print, quote
-from environment import make_global_environment
-from evaluator import evaluate, evaluate_expression
+if __name__ == "__main__" and not __package__:
+    # run as a script: import the modules from the scheme package, instead of
+    # the directory of the script
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    __package__ = 'scheme'
+    importlib.import_module(__package__)
+
+from .compat import PY2, input, xrange, utf8_stdin
+from .cons import pretty_print, quote
+from . import bundle
+from . import image
+from .environment import make_global_environment
+from .evaluator import evaluate, evaluate_expression
 
 def identation_position(text):
     """
@@ -22,7 +35,7 @@ def identation_position(text):
     # iterate over text from end to begining
     for i in xrange(len(text)-1, -1, -1):
         # find the first non-whitespace char
-        if not re.match('[\s(]', text[i]):
+        if not re.match(r'[\s(]', text[i]):
             if text[i] == ')':
                 # expression: find the beginning of this expression
                 nesting = 1
@@ -36,7 +49,7 @@ def identation_position(text):
             else:
                 # symbol: find the beginning of this symbol
                 for j in xrange(i-1, -1, -1):
-                    if re.match('[\s(]', text[j]):
+                    if re.match(r'[\s(]', text[j]):
                         return j+1
     return 0
 
@@ -56,14 +69,15 @@ class InterpreterInput(object):
             self.prompt = '>> '
         return self
 
-    def next(self):
+    def __next__(self):
         if self.input_buffer:
             return self.input_buffer.pop(0)
         else:
             identation = ' ' * identation_position(self.input_text)
             self.prompt = '... ' + identation
 
-            self.input_text = identation + unicode(raw_input(self.prompt), 'utf-8')
+            line = input(self.prompt)
+            self.input_text = identation + (line.decode('utf-8') if PY2 else line)
             self.input_buffer = list(self.input_text)
 
             if not self.input_buffer:
@@ -72,10 +86,12 @@ class InterpreterInput(object):
             self.input_buffer.append('\n')
             return next(self)
 
-def repl():
+    next = __next__
+
+def repl(make_environment=make_global_environment):
     #: the built-in scheme forms and special repl commands
     KEYWORDS = ('lambda', 'macro', 'if', 'quote', 'eval', 'define', 'delay',
-                '.reset', '.exit', '.quit', '.help')
+                'stream-cons', 'pure', '.reset', '.exit', '.quit', '.help')
 
     # the scheme auto-completer
     def completer(text, state):
@@ -87,7 +103,7 @@ def repl():
                 state -= 1
 
         # look through the environment names
-        for w in environment.iterkeys():
+        for w in environment.keys():
             if w.startswith(text):
                 if state <= 0:
                     return w
@@ -104,19 +120,19 @@ def repl():
     readline.parse_and_bind("set blink-matching-paren on")
     readline.set_completer(completer)
 
-    environment = make_global_environment()
+    environment = make_environment()
     while True:
 
         try:
-            text = raw_input(">>  ")
+            text = input(">>  ")
 
             # test for special commands
             if text == '.reset':
-                print "reseting environment..."
-                environment = make_global_environment()
+                print("reseting environment...")
+                environment = make_environment()
                 continue
             elif text == '.help':
-                print "Just type scheme expression and have fun."
+                print("Just type scheme expression and have fun.")
                 continue
             elif text in ('.exit', '.quit'):
                 break
@@ -124,27 +140,67 @@ def repl():
             result = evaluate_expression(InterpreterInput(text),
                                          environment)
 
-            print "=>", pretty_print(result)
+            print("=>", pretty_print(result))
 
             # set % as the last evaluated expression in environment
             environment['%'] = quote(result)
         except EOFError:
             break
         except KeyboardInterrupt:
-            print "\ninterrupt."
+            print("\ninterrupt.")
         except Exception as e:
-            print "error:", e.message
+            print("error:", e)
 
-    print "\nexiting..."
+    print("\nexiting...")
+
+def run_stdin(environment):
+    """
+    Evaluates the program read from the standard input, line by line: each
+    expression is evaluated as soon as it's complete
+    """
+    stdin = utf8_stdin()
+    evaluate(iter(stdin.readline, u''), environment, streaming=True)
+
+def run_file(path, environment):
+    "Evaluates the program (or bundle) in the file"
+    if bundle.is_bundle(path):
+        bundle.run_bundle(path, environment)
+    else:
+        with codecs.open(path, 'r', 'utf-8') as f:
+            evaluate(f, environment, streaming=True)
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        repl()
-    elif len(sys.argv) == 2:
-        with codecs.open(sys.argv[1], 'r', 'utf-8') as f:
-            evaluate(f,make_minimum_environment())
+    arguments = sys.argv[1:]
+    make_environment = make_global_environment
+    if len(arguments) >= 2 and arguments[0] == '--image':
+        image_path = arguments[1]
+        make_environment = lambda: image.load_image(image_path)
+        arguments = arguments[2:]
+
+    if not arguments:
+        repl(make_environment)
+    elif len(arguments) == 1 and arguments[0] == '-':
+        run_stdin(make_environment())
+    elif len(arguments) == 1:
+        run_file(arguments[0], make_environment())
+    elif len(arguments) == 3 and arguments[0] == '--bundle':
+        total, kept = bundle.make_bundle(arguments[1], arguments[2])
+        sys.stderr.write("%s: %d of %d top-level expressions bundled\n" %
+                         (arguments[2], kept, total))
+    elif len(arguments) >= 2 and arguments[0] == '--save-image':
+        environment = make_environment()
+        for path in arguments[2:]:
+            run_file(path, environment)
+        image.save_image(environment, arguments[1])
     else:
-        sys.stderr.write("Usage: %s [FILE]\nif FILE is not provided, scheme runs in eval-print-loop mode.\n" %
-                         sys.argv[0])
+        sys.stderr.write("Usage: %s [--image IMAGE] [FILE]\n"
+                         "       %s --bundle FILE OUTPUT\n"
+                         "       %s [--image IMAGE] --save-image OUTPUT [FILE ...]\n"
+                         "if FILE is not provided, scheme runs in eval-print-loop mode. "
+                         "If FILE is -, the program is read from the standard input. "
+                         "FILE may also be a bundle, written by --bundle with FILE and the "
+                         "reachable definitions of the files it includes. "
+                         "--save-image writes the image of the environment after evaluating "
+                         "the files, and --image starts from that environment instead of a "
+                         "new one.\n" % ((sys.argv[0],) * 3))
         sys.exit(1)
-
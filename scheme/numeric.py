@@ -0,0 +1,246 @@
+# coding: utf-8
+
+"""
+Numeric arrays. They hold a sequence of numbers in a single (unboxed) buffer,
+and the arithmetic and comparison operators work on them element-wise,
+broadcasting scalars, so a whole array goes through one built-in procedure
+call. NumPy is used when installed, otherwise the standard array module;
+both hold the same types (booleans, integers of a C long, or floats) and
+raise the same errors when building arrays, dividing by zero and on
+integer overflow. Booleans are added, multiplied, etc. as the integers 0
+and 1 by both.
+"""
+
+from __future__ import division
+
+import array
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .compat import integer_types
+from .cons import pretty_print
+from .thunk import iter_stream
+
+__all__ = ['NumericArray', 'is_array', 'to_array', 'array_range', 'array_sum',
+           'array_mean', 'array_dot', 'divide', 'equal']
+
+#: the NumPy dtypes of the array module type codes
+NUMPY_DTYPES = {'b': '?', 'l': 'l', 'd': 'd'}
+
+def typecode_for(values):
+    "The array module type code that fits all the values"
+    if values and all(type(v) == bool for v in values):
+        return 'b'
+    elif all(isinstance(v, integer_types) for v in values):
+        return 'l'
+    elif all(isinstance(v, integer_types + (float,)) for v in values):
+        return 'd'
+    raise ValueError("Numeric arrays only hold integers and floats: %s" %
+                     pretty_print([v for v in values if not isinstance(v, integer_types + (float,))][0]))
+
+def as_number(value):
+    "Transforms a boolean (or a NumPy array of them) into integers"
+    if numpy is not None and getattr(value, 'dtype', None) is not None:
+        return value.astype('l') if value.dtype.kind == 'b' else value
+    return int(value) if type(value) == bool else value
+
+def integer_overflow(op, a, b, result):
+    """
+    The largest exact result of op over the elements of the NumPy operands a
+    and b that doesn't fit the integers of result (which wrapped), or None
+    """
+    # the results computed with floats are close enough to find the
+    # candidates, which are computed again with python integers
+    approximate = numpy.asarray(op(numpy.asarray(a, dtype='d'),
+                                   numpy.asarray(b, dtype='d')))
+    limits = numpy.iinfo(result.dtype)
+    overflows = []
+    for index in numpy.flatnonzero(~(abs(approximate) < 2.0 ** (limits.bits - 2))):
+        exact = op(int(a[index] if numpy.ndim(a) else a),
+                   int(b[index] if numpy.ndim(b) else b))
+        if not limits.min <= exact <= limits.max:
+            overflows.append(exact)
+    return max(overflows, key=abs) if overflows else None
+
+def to_python(value):
+    "Transforms NumPy scalars into the equivalent python number"
+    return value.item() if hasattr(value, 'item') else value
+
+class NumericArray(object):
+    """
+    A fixed-length array of numbers
+    """
+
+    def __init__(self, values):
+        """
+        Creates an array from an iterable of numbers, or from a NumPy array
+        or array.array. Raises ValueError for values that are not numbers, or
+        integers that don't fit a C long.
+        """
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if values.dtype.kind not in 'biuf':
+                raise ValueError("Numeric arrays only hold integers and floats: %s" % values.dtype)
+            self.values = values
+            return
+        elif numpy is None and isinstance(values, array.array):
+            self.values = values
+            return
+
+        values = list(values)
+        typecode = typecode_for(values)
+        try:
+            if numpy is not None:
+                self.values = numpy.array(values, dtype=NUMPY_DTYPES[typecode])
+            else:
+                self.values = array.array(typecode, values)
+        except OverflowError:
+            raise ValueError("Integer out of the range of numeric arrays: %s" %
+                             max(values, key=abs))
+
+    def apply(self, op, other, reflected=False):
+        """
+        Applies a binary operator element-wise, with another array of the same
+        length or with a scalar
+        """
+        if is_array(other) and len(other) != len(self):
+            raise ValueError("Arrays have different lengths: %d and %d" %
+                             (len(self), len(other)))
+
+        if numpy is not None:
+            values = as_number(self.values)
+            other_values = as_number(other.values if is_array(other) else other)
+            # NumPy divides by zero with a warning: raise as Python does
+            if op in (divide, operator.truediv, operator.mod):
+                divisor = values if reflected else other_values
+                if numpy.any(numpy.asarray(divisor) == 0):
+                    raise ZeroDivisionError("division by zero")
+            if reflected:
+                values, other_values = other_values, values
+            try:
+                result = op(values, other_values)
+            except OverflowError:
+                raise ValueError("Integer out of the range of numeric arrays: %s" % other)
+            # NumPy integers wrap around: raise as the array module does
+            if result.dtype.kind in 'iu':
+                overflow = integer_overflow(op, values, other_values, result)
+                if overflow is not None:
+                    raise ValueError("Integer out of the range of numeric arrays: %s" % overflow)
+            return NumericArray(result)
+
+        if is_array(other):
+            pairs = zip(other, self) if reflected else zip(self, other)
+        elif reflected:
+            pairs = ((other, value) for value in self)
+        else:
+            pairs = ((value, other) for value in self)
+        return NumericArray([op(a, b) for a, b in pairs])
+
+    __add__  = lambda self, other: self.apply(operator.add, other)
+    __sub__  = lambda self, other: self.apply(operator.sub, other)
+    __mul__  = lambda self, other: self.apply(operator.mul, other)
+    __div__  = lambda self, other: self.apply(divide, other)
+    __truediv__ = lambda self, other: self.apply(operator.truediv, other)
+    __mod__  = lambda self, other: self.apply(operator.mod, other)
+    __radd__ = lambda self, other: self.apply(operator.add, other, True)
+    __rsub__ = lambda self, other: self.apply(operator.sub, other, True)
+    __rmul__ = lambda self, other: self.apply(operator.mul, other, True)
+    __rdiv__ = lambda self, other: self.apply(divide, other, True)
+    __rtruediv__ = lambda self, other: self.apply(operator.truediv, other, True)
+    __rmod__ = lambda self, other: self.apply(operator.mod, other, True)
+    __lt__   = lambda self, other: self.apply(operator.lt, other)
+    __le__   = lambda self, other: self.apply(operator.le, other)
+    __gt__   = lambda self, other: self.apply(operator.gt, other)
+    __ge__   = lambda self, other: self.apply(operator.ge, other)
+    # __eq__ is not overridden, so arrays can still be compared as values:
+    # the element-wise = is the equal function
+
+    def nth(self, index):
+        if not 0 <= index < len(self):
+            raise ValueError("Array index out of range: %s" % index)
+        return to_python(self.values[index])
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        if numpy is not None:
+            return iter(self.values.tolist())
+        elif self.values.typecode == 'b':
+            return (bool(value) for value in self.values)
+        else:
+            return iter(self.values)
+
+    def __repr__(self):
+        return "#array(%s)" % ' '.join(pretty_print(value) for value in self)
+
+is_array = lambda x: isinstance(x, NumericArray)
+
+def is_integer(value):
+    "Whether the value is an integer, or a NumPy integer (or array of them)"
+    if isinstance(value, integer_types):
+        return True
+    return numpy is not None and getattr(value, 'dtype', None) is not None and value.dtype.kind in 'biu'
+
+def divide(a, b):
+    """
+    Divides the numbers (or arrays, element-wise) as the / operator of
+    Python 2: the division of integers is rounded down
+    """
+    if is_array(a):
+        return a.apply(divide, b)
+    elif is_array(b):
+        return b.apply(divide, a, True)
+    elif is_integer(a) and is_integer(b):
+        return a // b
+    return a / b
+
+def equal(a, b):
+    "Whether the numbers are equal (element-wise if one of them is an array)"
+    if is_array(a):
+        return a.apply(operator.eq, b)
+    elif is_array(b):
+        return b.apply(operator.eq, a, True)
+    return a == b
+
+def to_array(value):
+    "Returns value if it's an array, or an array with the elements of a list"
+    return value if is_array(value) else NumericArray(iter_stream(value))
+
+def array_range(start, stop, step=1):
+    "Creates an array with the numbers from start (inclusive) to stop"
+    if step == 0:
+        raise ValueError("Array range step can't be zero")
+    if numpy is not None:
+        return NumericArray(numpy.arange(start, stop, step))
+
+    values = []
+    value = start
+    while (value < stop) if step > 0 else (value > stop):
+        values.append(value)
+        value += step
+    return NumericArray(values)
+
+def array_sum(value):
+    values = to_array(value)
+    if numpy is not None:
+        return to_python(values.values.sum())
+    return sum(values)
+
+def array_mean(value):
+    values = to_array(value)
+    if not len(values):
+        raise ValueError("Mean of an empty array")
+    return float(array_sum(values)) / len(values)
+
+def array_dot(a, b):
+    a, b = to_array(a), to_array(b)
+    if len(a) != len(b):
+        raise ValueError("Arrays have different lengths: %d and %d" %
+                         (len(a), len(b)))
+    if numpy is not None:
+        return to_python(numpy.dot(a.values, b.values))
+    return sum(x * y for x, y in zip(a, b))
@@ -1,7 +1,7 @@
 #coding: utf-8
 
-from buffer import Buffer
-import lexer
+from .buffer import Buffer
+from . import lexer
 
 __all__ = ["Parser"]
 
@@ -21,8 +21,34 @@ class Expression(object):
         return Optional(self)
 
     def match(self, tokens, mandatory=False):
+        memo = self.parser.memo
+        if memo is None:
+            result = self.parser.grammar[self.name].match(tokens, mandatory)
+            return Result(True, [Element(result.tree, self.name)]) if result.matches else Result(False)
+
+        # packrat parsing: the result of the expression at each position is
+        # kept, with its tree materialized and the position where it ends
+        key = (self.name, tokens.idx)
+        if key in memo:
+            tree, end = memo[key]
+            if tree is not None:
+                tokens.idx = end
+                return Result(True, tree)
+            elif not mandatory:
+                return Result(False)
+            # else: match again, to raise the syntax error
+
         result = self.parser.grammar[self.name].match(tokens, mandatory)
-        return Result(True, [Element(result.tree, self.name)]) if result.matches else Result(False)
+        if result.matches:
+            tree = [Element(list(result.tree), self.name)]
+            memo[key] = (tree, tokens.idx)
+            return Result(True, tree)
+
+        # failures are only final when not mandatory (otherwise an error
+        # would have been raised)
+        if not mandatory:
+            memo[key] = (None, None)
+        return Result(False)
 
     def __repr__(self):
         return str(self.name)
@@ -65,6 +91,17 @@ class And(Expression):
     def match(self, tokens, mandatory=False):
         matches = []
 
+        if mandatory:
+            # nothing is tried after a mandatory expression fails, so there's
+            # no need to mark (and keep) the tokens for backtracking
+            for expression in self.expressions:
+                result = expression.match(tokens, mandatory)
+                if result.matches:
+                    matches.extend(result.tree)
+                else:
+                    return Result(False)
+            return Result(True, matches)
+
         with tokens.mark() as m_tokens:
             for expression in self.expressions:
                 result = expression.match(m_tokens, mandatory)
@@ -189,9 +226,18 @@ class EndToken(Token):
 
 class Parser(object):
 
-    def __init__(self, start, grammar=None):
+    def __init__(self, start, grammar=None, packrat=False):
+        """
+        Creates a parser for the grammar, starting from the named expression.
+        In packrat mode, the result of each named expression at each position
+        is memoized while parsing, so backtracking never matches it again:
+        parsing takes linear time, at the cost of building the whole tree
+        eagerly.
+        """
         self.grammar = grammar if grammar else {}
         self.start = self.expression(start)
+        self.packrat = packrat
+        self.memo = None
 
     def token(self, type, discard=False):
         return Token(type, discard)
@@ -215,7 +261,11 @@ class Parser(object):
             # buffer is empty
             return None
 
-        result = self.start.match(tokensBuffer, True)
+        self.memo = {} if self.packrat else None
+        try:
+            result = self.start.match(tokensBuffer, True)
+        finally:
+            self.memo = None
 
         if result.matches == True:
             return result.tree[0]
@@ -0,0 +1,395 @@
+# coding: utf-8
+
+"""
+Persistent data structures. Updating any of them returns a new version that
+shares all the untouched nodes with the original one, which is left intact.
+Both structures are 32-way branching tries, so updates and lookups are
+O(log32 n).
+"""
+
+from .compat import xrange
+from .cons import cons, pretty_print
+
+__all__ = ['PersistentMap', 'PersistentVector', 'make_map', 'make_vector',
+           'is_persistent_map', 'is_persistent_vector']
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+#: marks a missing key in lookups
+NOT_FOUND = object()
+
+def hash_of(key):
+    "The 32-bit hash used to place a key in the trie"
+    return hash(key) & 0xffffffff
+
+def bit_count(n):
+    return bin(n).count('1')
+
+class Leaf(object):
+    """
+    A key/value entry in the hash array mapped trie
+    """
+    __slots__ = ('hash', 'key', 'value')
+
+    def __init__(self, hash_, key, value):
+        self.hash = hash_
+        self.key = key
+        self.value = value
+
+    def matches(self, hash_, key):
+        return self.hash == hash_ and self.key == key
+
+def merge_leaves(shift, a, b):
+    "Creates the smallest sub-trie holding two leaves with different keys"
+    if a.hash == b.hash:
+        return CollisionNode(a.hash, (a, b))
+
+    index_a = (a.hash >> shift) & MASK
+    index_b = (b.hash >> shift) & MASK
+    if index_a == index_b:
+        return BitmapNode(1 << index_a, (merge_leaves(shift + BITS, a, b),))
+    elif index_a < index_b:
+        return BitmapNode((1 << index_a) | (1 << index_b), (a, b))
+    else:
+        return BitmapNode((1 << index_a) | (1 << index_b), (b, a))
+
+class BitmapNode(object):
+    """
+    A trie node. Only the used slots are stored, the bitmap tells which ones
+    are present.
+    """
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def find(self, shift, hash_, key):
+        bit = 1 << ((hash_ >> shift) & MASK)
+        if not self.bitmap & bit:
+            return NOT_FOUND
+        entry = self.entries[bit_count(self.bitmap & (bit - 1))]
+        if type(entry) is Leaf:
+            return entry.value if entry.matches(hash_, key) else NOT_FOUND
+        return entry.find(shift + BITS, hash_, key)
+
+    def assoc(self, shift, leaf):
+        """
+        Returns a node with the leaf added (or replaced), and whether the
+        number of keys grew.
+        """
+        bit = 1 << ((leaf.hash >> shift) & MASK)
+        index = bit_count(self.bitmap & (bit - 1))
+
+        if not self.bitmap & bit:
+            return (BitmapNode(self.bitmap | bit,
+                               self.entries[:index] + (leaf,) + self.entries[index:]),
+                    True)
+
+        entry = self.entries[index]
+        if type(entry) is Leaf:
+            if entry.matches(leaf.hash, leaf.key):
+                if entry.value is leaf.value:
+                    return self, False
+                new_entry, added = leaf, False
+            else:
+                new_entry, added = merge_leaves(shift + BITS, entry, leaf), True
+        else:
+            new_entry, added = entry.assoc(shift + BITS, leaf)
+            if new_entry is entry:
+                return self, False
+
+        return (BitmapNode(self.bitmap,
+                           self.entries[:index] + (new_entry,) + self.entries[index+1:]),
+                added)
+
+    def without(self, shift, hash_, key):
+        """
+        Returns a node without the key: self if the key is not present, None
+        if the node became empty, or a single Leaf that can be lifted to the
+        parent node.
+        """
+        bit = 1 << ((hash_ >> shift) & MASK)
+        if not self.bitmap & bit:
+            return self
+        index = bit_count(self.bitmap & (bit - 1))
+        entry = self.entries[index]
+
+        if type(entry) is Leaf:
+            if not entry.matches(hash_, key):
+                return self
+            new_entry = None
+        else:
+            new_entry = entry.without(shift + BITS, hash_, key)
+            if new_entry is entry:
+                return self
+
+        if new_entry is None:
+            if self.bitmap == bit:
+                return None
+            entries = self.entries[:index] + self.entries[index+1:]
+            if len(entries) == 1 and type(entries[0]) is Leaf:
+                return entries[0]
+            return BitmapNode(self.bitmap ^ bit, entries)
+        elif type(new_entry) is Leaf and len(self.entries) == 1:
+            return new_entry
+        else:
+            return BitmapNode(self.bitmap,
+                              self.entries[:index] + (new_entry,) + self.entries[index+1:])
+
+class CollisionNode(object):
+    """
+    Holds the leaves whose keys have the very same hash
+    """
+    __slots__ = ('hash', 'entries')
+
+    def __init__(self, hash_, entries):
+        self.hash = hash_
+        self.entries = entries
+
+    def find(self, shift, hash_, key):
+        for entry in self.entries:
+            if entry.matches(hash_, key):
+                return entry.value
+        return NOT_FOUND
+
+    def assoc(self, shift, leaf):
+        if leaf.hash != self.hash:
+            # nest this node in a bitmap node, and add the leaf there
+            node = BitmapNode(1 << ((self.hash >> shift) & MASK), (self,))
+            return node.assoc(shift, leaf)
+
+        for index, entry in enumerate(self.entries):
+            if entry.matches(leaf.hash, leaf.key):
+                if entry.value is leaf.value:
+                    return self, False
+                return (CollisionNode(self.hash,
+                                      self.entries[:index] + (leaf,) + self.entries[index+1:]),
+                        False)
+
+        return CollisionNode(self.hash, self.entries + (leaf,)), True
+
+    def without(self, shift, hash_, key):
+        for index, entry in enumerate(self.entries):
+            if entry.matches(hash_, key):
+                entries = self.entries[:index] + self.entries[index+1:]
+                return entries[0] if len(entries) == 1 else CollisionNode(self.hash, entries)
+        return self
+
+class PersistentMap(object):
+    """
+    An immutable map implemented as a hash array mapped trie (HAMT)
+    """
+
+    def __init__(self, root=None, count=0):
+        "Creates an empty map. The arguments are used internally by updates"
+        self.root = root
+        self.count = count
+
+    def get(self, key, default=None):
+        if self.root is None:
+            return default
+        value = self.root.find(0, hash_of(key), key)
+        return default if value is NOT_FOUND else value
+
+    def assoc(self, key, value):
+        "Return a new map where key is associated with value"
+        root = self.root if self.root is not None else BitmapNode(0, ())
+        new_root, added = root.assoc(0, Leaf(hash_of(key), key, value))
+        if new_root is self.root:
+            return self
+        return PersistentMap(new_root, self.count + 1 if added else self.count)
+
+    def dissoc(self, key):
+        "Return a new map without key"
+        if self.root is None:
+            return self
+        new_root = self.root.without(0, hash_of(key), key)
+        if new_root is self.root:
+            return self
+        if type(new_root) is Leaf:
+            new_root = BitmapNode(1 << (new_root.hash & MASK), (new_root,))
+        return PersistentMap(new_root, self.count - 1)
+
+    def __contains__(self, key):
+        return self.get(key, NOT_FOUND) is not NOT_FOUND
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        "Generates the (key, value) tuples in the map"
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            for entry in reversed(node.entries):
+                if type(entry) is Leaf:
+                    yield entry.key, entry.value
+                else:
+                    stack.append(entry)
+
+    def __iter__(self):
+        for key, value in self.items():
+            yield key
+
+    def __repr__(self):
+        return "#hash(%s)" % ' '.join("(%s . %s)" % (pretty_print(key), pretty_print(value))
+                                      for key, value in self.items())
+
+class PersistentVector(object):
+    """
+    An immutable vector implemented as a 32-way branching trie, where the
+    last (up to 32) elements are kept in a separate tail, so appending is
+    mostly a copy of the tail.
+    """
+
+    def __init__(self, count=0, shift=BITS, root=(), tail=()):
+        "Creates an empty vector. The arguments are used internally by updates"
+        self.count = count
+        self.shift = shift
+        self.root = root
+        self.tail = tail
+
+    def tail_offset(self):
+        return 0 if self.count < WIDTH else ((self.count - 1) >> BITS) << BITS
+
+    def leaf_for(self, index):
+        "The 32-element node that holds the index"
+        if not 0 <= index < self.count:
+            raise ValueError("Vector index out of range: %s" % index)
+        if index >= self.tail_offset():
+            return self.tail
+
+        node = self.root
+        for level in xrange(self.shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+        return node
+
+    def nth(self, index):
+        return self.leaf_for(index)[index & MASK]
+
+    def assoc(self, index, value):
+        "Return a new vector with the value at index (which can be the length)"
+        if index == self.count:
+            return self.push(value)
+        elif index >= self.tail_offset() and 0 <= index < self.count:
+            position = index & MASK
+            return PersistentVector(self.count, self.shift, self.root,
+                                    self.tail[:position] + (value,) + self.tail[position+1:])
+
+        self.leaf_for(index) # checks the range
+
+        def assoc_in(level, node):
+            position = (index >> level) & MASK
+            if level == 0:
+                child = value
+            else:
+                child = assoc_in(level - BITS, node[position])
+            return node[:position] + (child,) + node[position+1:]
+
+        return PersistentVector(self.count, self.shift,
+                                assoc_in(self.shift, self.root), self.tail)
+
+    def push(self, value):
+        "Return a new vector with value appended"
+        if len(self.tail) < WIDTH:
+            return PersistentVector(self.count + 1, self.shift, self.root,
+                                    self.tail + (value,))
+
+        # the tail is full: push it into the trie
+        shift = self.shift
+        if (self.count >> BITS) > (1 << self.shift):
+            # root overflow
+            root = (self.root, new_path(self.shift, self.tail))
+            shift += BITS
+        else:
+            root = self.push_tail(self.shift, self.root)
+
+        return PersistentVector(self.count + 1, shift, root, (value,))
+
+    def push_tail(self, level, node):
+        position = ((self.count - 1) >> level) & MASK
+        if level == BITS:
+            child = self.tail
+        elif position < len(node):
+            child = self.push_tail(level - BITS, node[position])
+        else:
+            child = new_path(level - BITS, self.tail)
+        return node[:position] + (child,)
+
+    def pop(self):
+        "Return a new vector without the last element"
+        if self.count == 0:
+            raise ValueError("Can't pop empty vector")
+        elif self.count == 1:
+            return PersistentVector()
+        elif self.count - self.tail_offset() > 1:
+            return PersistentVector(self.count - 1, self.shift, self.root,
+                                    self.tail[:-1])
+
+        tail = self.leaf_for(self.count - 2)
+        root = self.pop_tail(self.shift, self.root)
+        shift = self.shift
+        if root is None:
+            root = ()
+        if shift > BITS and len(root) == 1:
+            root = root[0]
+            shift -= BITS
+        return PersistentVector(self.count - 1, shift, root, tail)
+
+    def pop_tail(self, level, node):
+        position = ((self.count - 2) >> level) & MASK
+        if level > BITS:
+            child = self.pop_tail(level - BITS, node[position])
+            if child is None and position == 0:
+                return None
+            return node[:position] + ((child,) if child is not None else ())
+        elif position == 0:
+            return None
+        else:
+            return node[:position]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for offset in xrange(0, self.tail_offset(), WIDTH):
+            for value in self.leaf_for(offset):
+                yield value
+        for value in self.tail:
+            yield value
+
+    def __repr__(self):
+        return "#(%s)" % ' '.join(pretty_print(value) for value in self)
+
+def new_path(level, node):
+    "Wraps node in single-child nodes up to level"
+    while level:
+        node = (node,)
+        level -= BITS
+    return node
+
+def make_map(iterable):
+    """
+    Creates a map from an iterable of alternating keys and values
+    """
+    result = PersistentMap()
+    iterator = iter(iterable)
+    for key in iterator:
+        try:
+            result = result.assoc(key, next(iterator))
+        except StopIteration:
+            raise ValueError("Missing value for key %s" % pretty_print(key))
+    return result
+
+def make_vector(iterable):
+    "Creates a vector with the elements of an iterable"
+    result = PersistentVector()
+    for value in iterable:
+        result = result.push(value)
+    return result
+
+is_persistent_map = lambda x: isinstance(x, PersistentMap)
+is_persistent_vector = lambda x: isinstance(x, PersistentVector)
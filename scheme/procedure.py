@@ -1,8 +1,12 @@
 #! coding: utf-8
 
-from cons import *
+from collections import OrderedDict
 
-__all__ = ['Procedure', 'BuiltinProcedure', 'is_procedure']
+from .compat import integer_types
+from .cons import *
+
+__all__ = ['Procedure', 'BuiltinProcedure', 'MemoizedProcedure', 'is_procedure',
+           'is_memoized', 'apply_procedure']
 
 class Procedure(object):
     """
@@ -26,7 +30,7 @@ class Procedure(object):
 
     def __repr__(self):
         # find out the procedure's name in this environment
-        for key,value in self.environment.iteritems():
+        for key,value in self.environment.items():
             if value == self:
                 return "<compound procedure %s>" % key
 
@@ -54,7 +58,11 @@ class BuiltinProcedure(Procedure):
         self.max_args = max_args
 
     def __call__(self, args):
-        len_args = 0 if args is None else len(args)
+        self.check_arguments(0 if args is None else len(args))
+        return self.callable_(args)
+
+    def check_arguments(self, len_args):
+        "Raises ValueError if the procedure can't take len_args arguments"
         if self.min_args is not None and len_args < self.min_args:
             raise ValueError("Built-in procedure %s should receive at least %d arguments. %d given." %
                              (self.name, self.min_args, len_args))
@@ -62,10 +70,81 @@ class BuiltinProcedure(Procedure):
             raise ValueError("Built-in procedure %s should receive at most %d arguments. %d given." %
                              (self.name, self.max_args, len_args))
 
-        return self.callable_(args)
-
     def __repr__(self):
         return "<builtin procedure %s>" % self.name
 
+class MemoizedProcedure(BuiltinProcedure):
+    """
+    Wraps a procedure with a cache of its results, keyed by the (evaluated)
+    arguments. The cache holds up to size results, evicting the least
+    recently used ones, or is unbounded if size is None.
+    """
+
+    def __init__(self, procedure, size=None):
+        if size is not None and (type(size) not in integer_types or size <= 0):
+            raise ValueError("Memoization cache size should be a positive integer: %s" %
+                             pretty_print(size))
+        super(MemoizedProcedure, self).__init__(self.call, 'memoized')
+        self.procedure = procedure
+        self.size = size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, args):
+        arguments = tuple(iter(args)) if args else ()
+        # the type is part of the key, otherwise 1, 1.0 and #t are the same
+        key = tuple((type(a), a) for a in arguments)
+        try:
+            result = self.cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            result = apply_procedure(self.procedure, arguments)
+            if self.size is not None:
+                while self.cache and len(self.cache) >= self.size:
+                    self.cache.popitem(last=False)
+        except TypeError:
+            # unhashable arguments can't be cached
+            self.misses += 1
+            return apply_procedure(self.procedure, arguments)
+
+        # (re)insert as the most recently used
+        self.cache[key] = result
+        return result
+
+    def clear(self):
+        "Empties the cache and resets the statistics"
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # the bound method is rebuilt when unpickled
+        state = self.__dict__.copy()
+        del state['callable_']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.callable_ = self.call
+
+    def __repr__(self):
+        return "<memoized %s>" % self.procedure
+
 is_procedure = lambda x: isinstance(x, Procedure)
+is_memoized = lambda x: isinstance(x, MemoizedProcedure)
 
+def apply_procedure(procedure, arguments):
+    """
+    Applies a built-in or compound procedure to a sequence of (already
+    evaluated) arguments, and return the evaluated result.
+    """
+    if callable(procedure):
+        return procedure(make_list(arguments))
+    elif is_procedure(procedure):
+        from .evaluator import full_evaluate
+        return full_evaluate(cons(procedure, make_list([quote(a) for a in arguments])),
+                             procedure.environment)
+    else:
+        raise ValueError("Not an operator: %s" % pretty_print(procedure))
@@ -0,0 +1,349 @@
+# coding: utf-8
+
+"""
+The scheme reader. Builds the pair structure of expressions straight from
+the scheme tokens (SYMBOL, QUOTE, LPAREN, RPAREN and DOT), without
+backtracking and with an explicit stack, so the nesting depth and length of
+the lists are only bounded by memory. The syntax errors are the same (with
+the same line and column) as reported by the scheme grammar parser. A
+Reader holds the scheme tokenizers, and a cache of the expressions read.
+"""
+
+from collections import OrderedDict
+
+from .compat import string_types, file_types, xrange
+from .cons import cons, quote, make_list
+from . import lexer
+
+__all__ = ['Reader', 'read_expression', 'read_program', 'iter_program',
+           'split_program', 'iter_data', 'PROGRAM', 'EXPRESSION']
+
+#: Lex states constants enum
+(START, COMMENT, QUOTE, LPAREN, RPAREN, MAYBE_DOT, MAYBE_INTEGER, STRING_OPEN,
+        STRING_BODY, STRING_CLOSE, SCAPE_CHAR, SYMBOL,) = xrange(12)
+
+#: Grammar non-terminal constants enum
+(EXPRESSION, QUOTED_EXPRESSION, UNQUOTED_EXPRESSION, LIST, DOTED_EXPRESSION,
+        ATOM, PROGRAM) = xrange(7)
+
+#: Token patterns for the scheme bulk tokenizer, equivalent to
+#: SCHEME_LEX_RULES
+SCHEME_TOKEN_PATTERNS = [(r"\s+",                      None),
+                         (r";[^\n]*",                  None),
+                         (r"'",                        'QUOTE'),
+                         (r"\(",                       'LPAREN'),
+                         (r"\)",                       'RPAREN'),
+                         (r'"((?:[^"\\]|\\.)*)"',      'SYMBOL'),
+                         (r"\.(?![^\(\)\s;])",         'DOT'),
+                         (r"[^\s;'\(\)\.\"][^\(\)\s;]*|"
+                          r"\.[^\(\)\s;]+",            'SYMBOL')]
+
+#: The beginning of a string that is not closed yet: the text that the bulk
+#: tokenizers keep for the next chunk instead of reporting it
+STRING_PARTIAL = r'"(?:[^"\\]|\\.)*\\?'
+
+#: Token patterns for data files: as SCHEME_TOKEN_PATTERNS, but the atoms
+#: that are not strings are ATOM tokens, so they can be converted
+DATA_TOKEN_PATTERNS = SCHEME_TOKEN_PATTERNS[:-1] + [(SCHEME_TOKEN_PATTERNS[-1][0], 'ATOM')]
+
+#: Rules for the scheme lexical analyzer
+SCHEME_LEX_RULES = {START: lexer.State([(r"\s", START),
+                                        (r";",  COMMENT),
+                                        (r"'",  QUOTE),
+                                        (r"\(", LPAREN),
+                                        (r"\)", RPAREN),
+                                        (r"\.", MAYBE_DOT),
+                                        (r'"',  STRING_OPEN),
+                                        (r".",  SYMBOL)], discard=True),
+                    COMMENT: lexer.State([(r"\n",  START),
+                                          (r".", COMMENT)], discard=True),
+                    QUOTE: lexer.State(token='QUOTE'),
+                    LPAREN: lexer.State(token='LPAREN'),
+                    RPAREN: lexer.State(token='RPAREN'),
+                    MAYBE_DOT: lexer.State([(r"[^\(\)\s;]", SYMBOL)], token='DOT'),
+                    STRING_OPEN: lexer.State([(r'[^"\\]', STRING_BODY),
+                                              (r'\\', SCAPE_CHAR),
+                                              (r'"', STRING_CLOSE)], discard=True),
+                    STRING_BODY: lexer.State([(r'[^"\\]', STRING_BODY),
+                                              (r'\\', SCAPE_CHAR),
+                                              (r'"', STRING_CLOSE)]),
+                    SCAPE_CHAR: lexer.State([(r'.', STRING_BODY)]),
+                    STRING_CLOSE: lexer.State(token='SYMBOL', discard=True),
+                    SYMBOL: lexer.State([(r"[^\(\)\s;]", SYMBOL)], token='SYMBOL')}
+
+#: the states of a list being read: reading elements, reading the
+#: expression after a dot, and expecting the closing parenthesis
+ELEMENTS, DOTTED, CLOSING = xrange(3)
+
+#: marks a quoted expression in the stack
+QUOTED = object()
+
+class ListFrame(object):
+    "A list being read: the first and last pairs, and the reading state"
+    __slots__ = ('head', 'last', 'state')
+
+    def __init__(self):
+        self.head = self.last = None
+        self.state = ELEMENTS
+
+class NoMatch(Exception):
+    "The expression being read is not valid"
+
+def read(first, tokens, mandatory):
+    """
+    Reads an expression, given its first token and an iterator over the
+    remaining ones. Doesn't read any token past the expression. If the
+    expression is not valid, raises a SyntaxError if it's mandatory, or
+    NoMatch otherwise.
+    """
+    stack = []
+    token = first
+
+    #: the first token of the element being read in the outermost list
+    element_start = None
+
+    while True:
+        frame = stack[-1] if stack else None
+        kind = token.type if token is not None else None
+
+        if kind == 'RPAREN' and frame.__class__ is ListFrame and frame.state != DOTTED:
+            value = frame.head
+            stack.pop()
+        elif kind == 'DOT' and frame.__class__ is ListFrame and frame.state == ELEMENTS:
+            if len(stack) == 1:
+                element_start = token
+            frame.state = DOTTED
+            token = next(tokens, None)
+            continue
+        elif frame.__class__ is ListFrame and frame.state == CLOSING:
+            fail(token, stack, element_start, first, mandatory)
+        else:
+            if len(stack) == 1 and element_start is None:
+                element_start = token
+
+            if kind == 'SYMBOL':
+                value = token.value
+            elif kind == 'QUOTE':
+                # only atoms and lists are quoted
+                token = next(tokens, None)
+                if token is None or token.type not in ('SYMBOL', 'LPAREN'):
+                    fail(token, stack, element_start, first, mandatory)
+                stack.append(QUOTED)
+                continue
+            elif kind == 'LPAREN':
+                stack.append(ListFrame())
+                token = next(tokens, None)
+                continue
+            else:
+                fail(token, stack, element_start, first, mandatory)
+
+        # the value is complete: add it to the enclosing expressions
+        while stack:
+            frame = stack[-1]
+            if frame is QUOTED:
+                stack.pop()
+                value = quote(value)
+            elif frame.state == ELEMENTS:
+                cell = cons(value)
+                if frame.last is None:
+                    frame.head = cell
+                else:
+                    frame.last.second = cell
+                frame.last = cell
+                break
+            else:
+                if frame.last is None:
+                    frame.head = value
+                else:
+                    frame.last.second = value
+                frame.state = CLOSING
+                break
+
+        if not stack:
+            return value
+
+        if len(stack) == 1 and stack[0].state == ELEMENTS:
+            element_start = None
+        token = next(tokens, None)
+
+def fail(token, stack, element_start, first, mandatory):
+    """
+    Raises the error of an unexpected token (or end of input, if it's None)
+    while reading the expression started by the first token, as the scheme
+    grammar parser does: it backtracks to the start of the invalid element
+    of the outermost list and reports it there.
+    """
+    if not mandatory:
+        raise NoMatch()
+
+    if not stack or stack[0] is QUOTED:
+        raise SyntaxError('Expecting LPAREN, but found %s. At line %d, column %d' %
+                          (first.value, first.line, first.column))
+
+    if len(stack) == 1 and stack[0].state == CLOSING or element_start is None:
+        found = token
+    else:
+        found = element_start
+
+    if found is None:
+        raise SyntaxError('Unexpected end of input. Expecting RPAREN')
+    raise SyntaxError('Expecting RPAREN, but found %s. At line %d, column %d' %
+                      (found.value, found.line, found.column))
+
+def read_expression(tokens):
+    """
+    Reads the first expression from an iterable of tokens, or returns None if
+    there are none. The tokens after the expression are not read.
+    """
+    tokens = iter(tokens)
+    first = next(tokens, None)
+    return None if first is None else read(first, tokens, True)
+
+def iter_program(tokens):
+    """
+    Generates the expressions of a program, reading the tokens as they are
+    needed.
+    """
+    tokens = iter(tokens)
+    first = next(tokens, None)
+    mandatory = True
+
+    while first is not None:
+        try:
+            yield read(first, tokens, mandatory)
+        except NoMatch:
+            raise SyntaxError('Unexpected %s, expected end of input. At line %d, column %d' %
+                              (first, first.line, first.column))
+        mandatory = False
+        first = next(tokens, None)
+
+def read_program(tokens):
+    """
+    Reads all the expressions of a program into a list, or returns None if
+    there are none.
+    """
+    return make_list(iter_program(tokens))
+
+def iter_data(tokens, atom):
+    """
+    Generates the expressions of a data file from its tokens (see
+    DATA_TOKEN_PATTERNS), with the value of each atom (but not of strings)
+    given by the atom function.
+    """
+    def converted(tokens):
+        for token in tokens:
+            if token.type == 'ATOM':
+                token.type = 'SYMBOL'
+                token.value = atom(token.value)
+            yield token
+
+    return iter_program(converted(tokens))
+
+def split_program(tokens):
+    """
+    Generates the tokens of each expression of a program, as lists, without
+    reading them: the expressions are delimited by the parenthesis depth
+    only, so the invalid ones fail when (and if) they are read.
+    """
+    expression = []
+    depth = 0
+    for token in tokens:
+        expression.append(token)
+        if token.type == 'LPAREN':
+            depth += 1
+        elif token.type == 'RPAREN':
+            depth -= 1
+        if depth <= 0 and token.type != 'QUOTE':
+            yield expression
+            expression = []
+            depth = 0
+    if expression:
+        yield expression
+
+class FileStream(object):
+
+    def __init__(self, file):
+        self.file = file
+
+    def __iter__(self):
+        # the tokenizer consumes whole chunks
+        return iter(self.file)
+
+class Reader(object):
+    """
+    Reads scheme expressions from strings, files or iterables of strings.
+    The tokenizers are built once, and the expressions read from strings are
+    kept in a cache (keyed by the text) of up to cache_size entries, evicting
+    the least recently used ones: reading the same text again returns the
+    same expressions, without parsing it. They are shared, so they must not
+    be changed.
+    """
+
+    def __init__(self, cache_size=256):
+        self.bulk_tokenizer = lexer.PatternTokenizer(SCHEME_TOKEN_PATTERNS, partial=STRING_PARTIAL)
+        self.tokenizer = lexer.Tokenizer(SCHEME_LEX_RULES, start=START)
+        self.data_tokenizer = lexer.PatternTokenizer(DATA_TOKEN_PATTERNS, partial=STRING_PARTIAL)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def tokens(self, input, bulk_tokenizer=True):
+        """
+        Returns a generator of the scheme tokens of a string, file or
+        iterable of strings. By default the input is tokenized in bulk with
+        SCHEME_TOKEN_PATTERNS; otherwise it goes through the character
+        automata.
+        """
+        # wraps input into a file-stream if it's a file object
+        if isinstance(input, file_types):
+            if not bulk_tokenizer:
+                input = FileStream(input)
+        elif hasattr(input, 'iter'):
+            raise ValueError("Invalid input object")
+
+        if bulk_tokenizer:
+            return self.bulk_tokenizer.tokens(input)
+        return self.tokenizer.tokens(input)
+
+    def read(self, input, start_parsing=PROGRAM, bulk_tokenizer=True):
+        """
+        Reads a program (a list of expressions), or a single expression if
+        start_parsing is EXPRESSION, from the input
+        """
+        if not isinstance(input, string_types) or not self.cache_size:
+            return self.parse(self.tokens(input, bulk_tokenizer), start_parsing)
+
+        key = (start_parsing, input)
+        try:
+            result = self.cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            result = self.parse(self.tokens(input, bulk_tokenizer), start_parsing)
+            if len(self.cache) >= self.cache_size:
+                self.cache.popitem(last=False)
+
+        # (re)insert as the most recently used
+        self.cache[key] = result
+        return result
+
+    def parse(self, tokens, start_parsing=PROGRAM):
+        if start_parsing == EXPRESSION:
+            return read_expression(tokens)
+        return read_program(tokens)
+
+    def data(self, input, atom):
+        """
+        Returns a generator of the expressions of a data file (or string, or
+        iterable of strings), read as they are needed, without the cache. The
+        values of the atoms are given by the atom function (e.g. to convert
+        numbers).
+        """
+        return iter_data(self.data_tokenizer.tokens(input), atom)
+
+    def clear(self):
+        "Empties the cache and resets the statistics"
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+"""
+Compact binary serialization of scheme values: pairs, nil, booleans, numbers
+and symbols (strings). Shared pairs and repeated symbols are written once and
+referenced afterwards, so the structure sharing is kept when the value is
+loaded back. Both directions walk the structure with an explicit stack, so
+long lists don't recurse.
+"""
+
+import struct
+
+from .compat import PY2, text_type, symbol_types, integer_types
+from .cons import cons, car, cdr, is_pair, pretty_print
+from .thunk import force, is_thunk
+
+__all__ = ['dumps', 'loads', 'dump', 'load']
+
+#: prefix of every serialized value (format name and version)
+MAGIC = b'PSCM\x01'
+
+(NIL, TRUE, FALSE, INTEGER, FLOAT, COMPLEX, BYTES, TEXT, PAIR,
+        REFERENCE) = (b'N', b'T', b'F', b'I', b'D', b'C', b'S', b'U', b'P', b'R')
+
+def encode_varint(n):
+    "Encodes a non-negative integer in 7-bit groups (least significant first)"
+    data = bytearray()
+    while n >= 0x80:
+        data.append((n & 0x7f) | 0x80)
+        n >>= 7
+    data.append(n)
+    return bytes(data)
+
+def dumps(value, force_lazy=True):
+    """
+    Serializes a scheme value into a byte string. Lazy lists are forced
+    along the way, or if force_lazy is false, only their evaluated part is
+    read and ValueError is raised for the rest.
+    """
+    out = [MAGIC]
+    memo = {}
+    stack = [value]
+
+    while stack:
+        value = stack.pop()
+        while is_thunk(value):
+            if not force_lazy and not value.is_evaluated:
+                raise ValueError("Cannot serialize an unevaluated lazy list")
+            value = force(value)
+
+        if is_pair(value):
+            key = id(value)
+            if key in memo:
+                out.append(REFERENCE + encode_varint(memo[key]))
+            else:
+                memo[key] = len(memo)
+                out.append(PAIR)
+                stack.append(cdr(value))
+                stack.append(car(value))
+        elif value is None:
+            out.append(NIL)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif type(value) in integer_types:
+            # zig-zag: small negative numbers are small too
+            out.append(INTEGER + encode_varint(value * 2 if value >= 0 else -value * 2 - 1))
+        elif type(value) == float:
+            out.append(FLOAT + struct.pack('>d', value))
+        elif type(value) == complex:
+            out.append(COMPLEX + struct.pack('>dd', value.real, value.imag))
+        elif type(value) in symbol_types:
+            key = (type(value), value)
+            if key in memo:
+                out.append(REFERENCE + encode_varint(memo[key]))
+            else:
+                memo[key] = len(memo)
+                data = value.encode('utf-8') if type(value) == text_type else value
+                out.append((TEXT if type(value) == text_type else BYTES) +
+                           encode_varint(len(data)) + data)
+        else:
+            raise ValueError("Cannot serialize %s" % pretty_print(value))
+
+    return b''.join(out)
+
+def loads(data):
+    """
+    Reads back a scheme value serialized with dumps
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a serialized scheme value")
+
+    position = len(MAGIC)
+    memo = []
+
+    def read_varint():
+        n = shift = 0
+        while True:
+            index = position + shift // 7
+            byte = ord(data[index:index+1])
+            n |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return n, position + shift // 7
+
+    # the slots to be filled, in order: (pair, whether it's the car)
+    root = cons(None)
+    slots = [(root, True)]
+
+    try:
+        while slots:
+            pair, is_car = slots.pop()
+            code = data[position:position+1]
+            if not code:
+                raise IndexError()
+            position += 1
+
+            if code == PAIR:
+                value = cons(None, None)
+                memo.append(value)
+                slots.append((value, False))
+                slots.append((value, True))
+            elif code == NIL:
+                value = None
+            elif code == TRUE:
+                value = True
+            elif code == FALSE:
+                value = False
+            elif code == INTEGER:
+                n, position = read_varint()
+                value = n // 2 if not n & 1 else -(n + 1) // 2
+            elif code == FLOAT:
+                value, = struct.unpack('>d', data[position:position+8])
+                position += 8
+            elif code == COMPLEX:
+                real, imag = struct.unpack('>dd', data[position:position+16])
+                value = complex(real, imag)
+                position += 16
+            elif code in (BYTES, TEXT):
+                length, position = read_varint()
+                value = data[position:position+length]
+                # symbols are text in Python 3
+                if code == TEXT or not PY2:
+                    value = value.decode('utf-8')
+                memo.append(value)
+                position += length
+            elif code == REFERENCE:
+                index, position = read_varint()
+                value = memo[index]
+            else:
+                raise ValueError("Invalid serialized data at byte %d" % (position - 1))
+
+            if is_car:
+                pair.first = value
+            else:
+                pair.second = value
+    except (IndexError, TypeError, struct.error):
+        raise ValueError("Truncated serialized data")
+
+    return root.first
+
+def dump(value, file):
+    "Serializes a scheme value into a (binary) file object"
+    file.write(dumps(value))
+
+def load(file):
+    "Reads back a scheme value from a (binary) file object"
+    return loads(file.read())
@@ -1,5 +1,7 @@
 #! coding: utf-8
 
+from .cons import cons, car, cdr, is_pair
+
 class Thunk(object):
     """
     Thunks represent unevaluated objects. Created with the special form (delay
@@ -16,3 +18,52 @@ class Thunk(object):
 
 is_thunk = lambda x: isinstance(x, Thunk)
 
+def force(value):
+    """
+    Return the value of a Thunk, evaluating it if it was not yet evaluated.
+    Any other value is returned as is.
+    """
+    if is_thunk(value):
+        from .evaluator import full_evaluate
+        return full_evaluate(value, value.environment)
+    return value
+
+def promise(callable_):
+    """
+    Creates a Thunk that, when forced, yields the result of calling callable_
+    without arguments. It's the Python counterpart of (delay <expression>).
+    """
+    return Thunk(cons(lambda args: callable_(), None), None)
+
+def make_stream(iterable):
+    """
+    Build a lazy list, in the same shape as the ones built with cons', using
+    the elements of an iterable. The iterable is only advanced as the list
+    cdrs are forced. If the iterable raises an exception (which ends a
+    generator), forcing the same cdr again raises it again.
+    """
+    iterator = iter(iterable)
+    failure = []
+
+    def next_cell():
+        if failure:
+            raise failure[0]
+        try:
+            return cons(next(iterator), promise(next_cell))
+        except StopIteration:
+            return None
+        except Exception as e:
+            failure.append(e)
+            raise
+
+    return next_cell()
+
+def iter_stream(stream):
+    """
+    Iterates over the elements of a list, forcing the lazy cdrs (as cdr'
+    does) along the way.
+    """
+    current = stream
+    while is_pair(current):
+        yield car(current)
+        current = force(cdr(current))
@@ -8,6 +8,14 @@ from tests.parser_test import TestParser
 from tests.buffer_test import TestBuffer
 from tests.evaluator_test import TestEvaluator
 from tests.macro_test import TestMacro
+from tests.persistent_test import TestPersistent
+from tests.numeric_test import TestNumeric, TestNumPyNumeric
+from tests.serialize_test import TestSerialize
+from tests.functional_test import TestFunctional
+from tests.cache_test import TestCache
+from tests.reader_test import TestReader
+from tests.bundle_test import TestBundle
+from tests.image_test import TestImage
 
 if __name__ == '__main__':
     unittest.main()
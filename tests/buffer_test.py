@@ -4,6 +4,7 @@
 import unittest
 
 import scheme.buffer as buffer
+from scheme.compat import xrange
 
 class TestBuffer(unittest.TestCase):
 
@@ -15,10 +16,10 @@ class TestBuffer(unittest.TestCase):
 
         count = 0
         for expected, value in zip(expectation, buf):
-            self.assertEquals(expected, value)
+            self.assertEqual(expected, value)
             count += 1
 
-        self.assertEquals(10, count)
+        self.assertEqual(10, count)
 
     def test_buffer_with_one_mark(self):
 
@@ -26,23 +27,23 @@ class TestBuffer(unittest.TestCase):
 
         i = iter(buf)
 
-        self.assertEquals(1, next(i))
-        self.assertEquals(2, next(i))
-        self.assertEquals(3, next(i))
+        self.assertEqual(1, next(i))
+        self.assertEqual(2, next(i))
+        self.assertEqual(3, next(i))
 
         with buf.mark() as markedBuffer:
 
             mi = iter(markedBuffer)
 
-            self.assertEquals(4, next(mi))
-            self.assertEquals(5, next(mi))
-            self.assertEquals(6, next(mi))
+            self.assertEqual(4, next(mi))
+            self.assertEqual(5, next(mi))
+            self.assertEqual(6, next(mi))
 
 
-        self.assertEquals(7, next(i))
-        self.assertEquals(8, next(i))
-        self.assertEquals(9, next(i))
-        self.assertEquals(10, next(i))
+        self.assertEqual(7, next(i))
+        self.assertEqual(8, next(i))
+        self.assertEqual(9, next(i))
+        self.assertEqual(10, next(i))
 
     def test_buffer_with_restore(self):
 
@@ -50,27 +51,27 @@ class TestBuffer(unittest.TestCase):
 
         i = iter(buf)
 
-        self.assertEquals(1, next(i))
-        self.assertEquals(2, next(i))
-        self.assertEquals(3, next(i))
+        self.assertEqual(1, next(i))
+        self.assertEqual(2, next(i))
+        self.assertEqual(3, next(i))
 
         with buf.mark() as markedBuffer:
 
             mi = iter(markedBuffer)
 
-            self.assertEquals(4, next(mi))
-            self.assertEquals(5, next(mi))
-            self.assertEquals(6, next(mi))
+            self.assertEqual(4, next(mi))
+            self.assertEqual(5, next(mi))
+            self.assertEqual(6, next(mi))
 
             markedBuffer.restore()
 
-        self.assertEquals(4, next(i))
-        self.assertEquals(5, next(i))
-        self.assertEquals(6, next(i))
-        self.assertEquals(7, next(i))
-        self.assertEquals(8, next(i))
-        self.assertEquals(9, next(i))
-        self.assertEquals(10, next(i))
+        self.assertEqual(4, next(i))
+        self.assertEqual(5, next(i))
+        self.assertEqual(6, next(i))
+        self.assertEqual(7, next(i))
+        self.assertEqual(8, next(i))
+        self.assertEqual(9, next(i))
+        self.assertEqual(10, next(i))
 
     def test_buffer_with_inner_restore(self):
 
@@ -78,32 +79,32 @@ class TestBuffer(unittest.TestCase):
 
         i = iter(buf)
 
-        self.assertEquals(1, next(i))
-        self.assertEquals(2, next(i))
-        self.assertEquals(3, next(i))
+        self.assertEqual(1, next(i))
+        self.assertEqual(2, next(i))
+        self.assertEqual(3, next(i))
 
         with buf.mark() as markedBuffer:
 
             mi = iter(markedBuffer)
 
-            self.assertEquals(4, next(mi))
-            self.assertEquals(5, next(mi))
-            self.assertEquals(6, next(mi))
+            self.assertEqual(4, next(mi))
+            self.assertEqual(5, next(mi))
+            self.assertEqual(6, next(mi))
 
             with markedBuffer.mark() as markedBuffer2:
                 mi2 = iter(markedBuffer2)
 
-                self.assertEquals(7, next(mi2))
-                self.assertEquals(8, next(mi2))
-                self.assertEquals(9, next(mi2))
+                self.assertEqual(7, next(mi2))
+                self.assertEqual(8, next(mi2))
+                self.assertEqual(9, next(mi2))
 
                 markedBuffer2.restore()
 
-            self.assertEquals(7, next(mi))
-            self.assertEquals(8, next(mi))
+            self.assertEqual(7, next(mi))
+            self.assertEqual(8, next(mi))
 
-        self.assertEquals(9, next(i))
-        self.assertEquals(10, next(i))
+        self.assertEqual(9, next(i))
+        self.assertEqual(10, next(i))
 
     def test_buffer_with_two_inner_restores(self):
 
@@ -111,40 +112,69 @@ class TestBuffer(unittest.TestCase):
 
         i = iter(buf)
 
-        self.assertEquals(1, next(i))
-        self.assertEquals(2, next(i))
-        self.assertEquals(3, next(i))
+        self.assertEqual(1, next(i))
+        self.assertEqual(2, next(i))
+        self.assertEqual(3, next(i))
 
         with buf.mark() as markedBuffer:
 
             mi = iter(markedBuffer)
 
-            self.assertEquals(4, next(mi))
-            self.assertEquals(5, next(mi))
-            self.assertEquals(6, next(mi))
+            self.assertEqual(4, next(mi))
+            self.assertEqual(5, next(mi))
+            self.assertEqual(6, next(mi))
 
             with markedBuffer.mark() as markedBuffer2:
                 mi2 = iter(markedBuffer2)
 
-                self.assertEquals(7, next(mi2))
-                self.assertEquals(8, next(mi2))
-                self.assertEquals(9, next(mi2))
+                self.assertEqual(7, next(mi2))
+                self.assertEqual(8, next(mi2))
+                self.assertEqual(9, next(mi2))
 
                 markedBuffer2.restore()
 
-            self.assertEquals(7, next(mi))
-            self.assertEquals(8, next(mi))
-            self.assertEquals(9, next(mi))
+            self.assertEqual(7, next(mi))
+            self.assertEqual(8, next(mi))
+            self.assertEqual(9, next(mi))
 
             markedBuffer.restore()
 
-        self.assertEquals(4, next(i))
-        self.assertEquals(5, next(i))
-        self.assertEquals(6, next(i))
-        self.assertEquals(7, next(i))
-        self.assertEquals(8, next(i))
-        self.assertEquals(9, next(i))
-        self.assertEquals(10, next(i))
+        self.assertEqual(4, next(i))
+        self.assertEqual(5, next(i))
+        self.assertEqual(6, next(i))
+        self.assertEqual(7, next(i))
+        self.assertEqual(8, next(i))
+        self.assertEqual(9, next(i))
+        self.assertEqual(10, next(i))
+
+    def test_memory_is_bounded(self):
+
+        buf = buffer.Buffer(xrange(1, 100001))
+
+        i = iter(buf)
+        for expected in xrange(1, 50001):
+            self.assertEqual(expected, next(i))
+            self.assertTrue(len(buf.buffer) <= 1)
+
+        # the values after the oldest mark are kept
+        with buf.mark() as markedBuffer:
+            mi = iter(markedBuffer)
+            self.assertEqual(50001, next(mi))
+
+            with markedBuffer.mark() as markedBuffer2:
+                mi2 = iter(markedBuffer2)
+                self.assertEqual(50002, next(mi2))
+                self.assertEqual(50003, next(mi2))
+                self.assertEqual(3, len(buf.buffer))
+                markedBuffer2.restore()
+
+            self.assertEqual(3, len(buf.buffer))
+            markedBuffer.restore()
+
+        self.assertTrue(buf)
+        self.assertEqual([50001, 50002, 50003, 50004], [next(i) for _ in xrange(4)])
+        self.assertTrue(len(buf.buffer) <= 1)
+        self.assertEqual(sum(xrange(50005, 100001)), sum(i))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scheme.environment import make_global_environment
+from scheme.cons import *
+import scheme.bundle as bundle
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.library = self.write('library.scm', """
+            (define double (lambda (x) (* x 2)))
+            (define quadruple (lambda (x) (double (double x))))
+            (define unused (lambda (x) (quadruple x)))
+            (define also-unused 1)""")
+        self.script = self.write('script.scm', """
+            (include %s)
+            (include %s)
+            (define result (quadruple 10))
+            result""" % (self.library, self.library))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, source):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def test_shake(self):
+        expressions = bundle.collect(self.script)
+        self.assertEqual(6, len(expressions))
+
+        kept = bundle.shake(expressions)
+        self.assertEqual(['(define double (lambda (x) (* x 2)))',
+                           '(define quadruple (lambda (x) (double (double x))))',
+                           '(define result (quadruple 10))',
+                           'result'],
+                          [pretty_print(e) for e in kept])
+
+    def test_guards(self):
+        library = self.write('guarded.scm', """
+            (unless (defined? __guarded__)
+                    (define triple (lambda (x) (* x 3)))
+                    (define unused 1)
+                    (define __guarded__ nil))""")
+        script = self.write('guarded-script.scm', """
+            (include %s)
+            (triple 2)""" % library)
+
+        # the guarded forms are shaken as top-level ones
+        kept = bundle.shake(bundle.collect(script))
+        self.assertEqual(['(define triple (lambda (x) (* x 3)))', '(triple 2)'],
+                          [pretty_print(e) for e in kept])
+
+    def test_bundle(self):
+        output = os.path.join(self.directory, 'script.scmb')
+        self.assertEqual((6, 4), bundle.make_bundle(self.script, output))
+        self.assertTrue(bundle.is_bundle(output))
+        self.assertFalse(bundle.is_bundle(self.script))
+
+        # the bundle runs without the library
+        os.remove(self.library)
+        self.assertEqual(40, bundle.run_bundle(output, make_global_environment()))
+
+        self.assertRaises(ValueError, bundle.load_bundle, self.script)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scheme.environment import make_global_environment
+from scheme.procedure import BuiltinProcedure, is_procedure
+import scheme.evaluator as evaluator
+from scheme.cons import *
+from scheme.evaluator import string_to_scheme
+import scheme.cache as cache
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.environ['SCHEME_CACHE_DIR'] = os.path.join(self.directory, 'cache')
+
+        # a library with a pure function
+        self.library = os.path.join(self.directory, 'library.scm')
+        self.write_library('(define f (lambda (x) (* x 2)))')
+
+        self.calls = []
+
+    def tearDown(self):
+        del os.environ['SCHEME_CACHE_DIR']
+        shutil.rmtree(self.directory)
+
+    def write_library(self, source):
+        with open(self.library, 'w') as f:
+            f.write(source)
+
+    def run_program(self, program):
+        "Runs the program in a new environment, recording the calls to record"
+        environment = make_global_environment()
+        def record(args):
+            self.calls.append(car(args))
+            return car(args)
+        environment['record'] = BuiltinProcedure(record, 'record', 1, 1)
+        evaluator.evaluate('(include %s)' % self.library, environment)
+        return evaluator.evaluate(program, environment)
+
+    def test_pure(self):
+
+        program = '(pure (cons (f (record 21)) (quote ("text" 1.5))))'
+        self.assertEqual(repr(self.run_program(program)), '(42 text 1.5)')
+        self.assertEqual(self.calls, [21])
+
+        # the second run reads the result from the cache
+        self.assertEqual(repr(self.run_program(program)), '(42 text 1.5)')
+        self.assertEqual(self.calls, [21])
+
+        # a different expression is computed
+        self.assertEqual(self.run_program('(pure (f (record 1)))'), 2)
+        self.assertEqual(self.calls, [21, 1])
+
+        # changing an included file invalidates the results
+        self.write_library('(define f (lambda (x) (* x 3)))')
+        self.assertEqual(repr(self.run_program(program)), '(63 text 1.5)')
+        self.assertEqual(self.calls, [21, 1, 21])
+
+        # values that can't be serialized are not cached
+        self.assertTrue(is_procedure(self.run_program('(pure (record f))')))
+        self.assertTrue(is_procedure(self.run_program('(pure (record f))')))
+        self.assertEqual(len(self.calls), 5)
+
+        # disabled cache
+        del os.environ['SCHEME_CACHE_DIR']
+        self.run_program(program)
+        self.run_program(program)
+        os.environ['SCHEME_CACHE_DIR'] = self.directory
+        self.assertEqual(self.calls[-2:], [21, 21])
+
+        self.assertRaises(SyntaxError, self.run_program, '(pure 1 2)')
+
+    def test_pure_program(self):
+
+        # the definitions of the program are part of the key
+        program = '(define n %d) (pure (f (record n)))'
+        self.assertEqual(20, self.run_program(program % 10))
+        self.assertEqual(20, self.run_program(program % 10))
+        self.assertEqual(22, self.run_program(program % 11))
+        self.assertEqual(self.calls, [10, 11])
+
+        # as in the repl, an expression at a time
+        environment = make_global_environment()
+        evaluator.evaluate_expression('(define n 12)', environment)
+        evaluator.evaluate_expression('(include %s)' % self.library, environment)
+        self.assertEqual(24, evaluator.evaluate_expression('(pure (f n))', environment))
+
+        # lazy lists are not forced to be cached
+        program = "(define count (lambda (n) (cons' (record n) (count (+ n 1))))) (pure (count 0))"
+        self.assertEqual(0, car(self.run_program(program)))
+        self.assertEqual(0, car(self.run_program(program)))
+        self.assertEqual(self.calls, [10, 11, 0, 0])
+
+    def test_compiled_includes(self):
+
+        compiled = cache.compiled_path(self.library)
+        self.assertEqual(os.path.join(self.directory, '__schemecache__', 'library.scmc'),
+                          compiled)
+
+        self.assertEqual(42, self.run_program('(f 21)'))
+        self.assertTrue(os.path.exists(compiled))
+
+        # the compiled expressions are used while the source doesn't change
+        stat = os.stat(self.library)
+        content_hash, expressions = cache.load_source(self.library)
+        cache.store_compiled(self.library, stat, content_hash,
+                             string_to_scheme('(define f (lambda (x) 0))'))
+        self.assertEqual(0, self.run_program('(f 21)'))
+
+        self.write_library('(define f (lambda (x) (* x 10)))')
+        self.assertEqual(210, self.run_program('(f 21)'))
+
+        # invalid compiled files are ignored
+        with open(compiled, 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(210, self.run_program('(f 21)'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,10 @@
 import unittest
 
 from scheme.environment import make_global_environment
+from scheme.procedure import BuiltinProcedure
 import scheme.evaluator as evaluator
 from scheme.cons import *
+from scheme.compat import xrange
 
 class TestEvaluator(unittest.TestCase):
 
@@ -22,7 +24,7 @@ class TestEvaluator(unittest.TestCase):
             self.compare_result(expected.first, actual.first)
             self.compare_result(expected.second, actual.second)
         else:
-            self.assertEquals(expected, actual)
+            self.assertEqual(expected, actual)
 
 
     def test_cons_car_and_cdr(self):
@@ -117,112 +119,242 @@ class TestEvaluator(unittest.TestCase):
 
         # using the () notation
         result = self.evaluate("(len ())")
-        self.assertEquals(0, result)
+        self.assertEqual(0, result)
 
         # using nil
         result = self.evaluate("(len nil)")
-        self.assertEquals(0, result)
+        self.assertEqual(0, result)
 
         # using empty list
         result = self.evaluate("(len (list ))")
-        self.assertEquals(0, result)
+        self.assertEqual(0, result)
 
         # using the () notation
         result = self.evaluate("(nil? ())")
-        self.assertEquals(True, result)
+        self.assertEqual(True, result)
 
         # using nil
         result = self.evaluate("(nil? nil)")
-        self.assertEquals(True, result)
+        self.assertEqual(True, result)
 
         # using empty list
         result = self.evaluate("(nil? (list ))")
-        self.assertEquals(True, result)
+        self.assertEqual(True, result)
 
 
     def test_iterate_over_cons(self):
 
         expression = cons(1, cons(2, cons(3, cons(4, cons(5, 6)))))
 
-        self.assertEquals([1,2,3,4,5], list(expression))
-        self.assertEquals(6, expression.terminal())
-        self.assertEquals(5, len(expression))
+        self.assertEqual([1,2,3,4,5], list(expression))
+        self.assertEqual(6, expression.terminal())
+        self.assertEqual(5, len(expression))
+
+    def test_list_view(self):
+
+        consumed = []
+        def rows():
+            for i in xrange(1, 101):
+                consumed.append(i)
+                yield i
+
+        view = make_view(rows())
+
+        self.assertTrue(is_pair(view))
+        self.assertEqual(1, car(view))
+        self.assertEqual([1], consumed)
+        self.assertEqual(2, cadr(view))
+        self.assertEqual([1, 2], consumed)
+        # cells are memoized, the iterator is not advanced again
+        self.assertTrue(cdr(view) is cdr(view))
+        self.assertEqual([1, 2], consumed)
+        self.assertEqual(None, make_view([]))
+
+        self.environment['rows'] = quote(view)
+        self.environment['letters'] = quote(make_view(['a', 'b', 'c']))
+        result = self.evaluate("""
+            (define sum-all
+                    (lambda (l total)
+                            (if (nil? l)
+                                total
+                                (sum-all (cdr' l) (+ total (car l))))))
+            (list (sum-all rows 0) (pair? letters) (car (cdr letters)) (len letters))
+        """)
+        self.assertEqual([5050, True, 'b', 3], list(iter(result)))
+        self.assertEqual(list(range(1, 101)), consumed)
+
+        # long views are walked without recursion
+        self.assertEqual(100000, len(make_view(xrange(100000))))
 
     def test_evaluate_expressions(self):
 
         # built-in procedure application
         result = self.evaluate("(+ 1 2 3)")
-        self.assertEquals(6, result)
+        self.assertEqual(6, result)
 
         # define special forms, environment
         result = self.evaluate("(define x 10) (define y 20) (+ x y)")
-        self.assertEquals(30, result)
+        self.assertEqual(30, result)
 
         # creating and calling procedures
         result = self.evaluate("(let ((inc (lambda (x) (+ x 1)))) (inc 40))")
-        self.assertEquals(41, result)
+        self.assertEqual(41, result)
 
         # if form
         result = self.evaluate("(define inc (lambda (x) (+ x 1))) (if (= (inc 40) 41) 3 4)")
-        self.assertEquals(3, result)
+        self.assertEqual(3, result)
 
         # quoting symbols
         result = self.evaluate("(+ 'a 'b)")
-        self.assertEquals('ab', result)
+        self.assertEqual('ab', result)
 
         # quoting lists
         result = self.evaluate("(let ((x '(+ 1 2))) (car x))")
-        self.assertEquals('+', result)
+        self.assertEqual('+', result)
 
         # length of a list
         result = self.evaluate("(define x '(+ 1 2)) (len x)")
-        self.assertEquals(3, result)
+        self.assertEqual(3, result)
 
         # using cdr
         result = self.evaluate("(let ((x '(+ 1 2))) (len (cdr x)))")
-        self.assertEquals(2, result)
+        self.assertEqual(2, result)
 
         # using cons
         result = self.evaluate("(define x (cons 1 2)) (car x)")
-        self.assertEquals(1, result)
+        self.assertEqual(1, result)
 
         # using cons
         result = self.evaluate("(let ((x (cons 1 2))) (cdr x))")
-        self.assertEquals(2, result)
+        self.assertEqual(2, result)
 
         # nested environments in let (using macro)
         result = self.evaluate("(let ((x 7) (y (let ((x 20)) (+ x 1)))) (+ x y))")
-        self.assertEquals(28, result)
+        self.assertEqual(28, result)
 
         # nested environments in lambdas
         result = self.evaluate("(define x 100) (define inc (lambda (x) (+ 1 x))) (+ (inc 7) x)")
-        self.assertEquals(108, result)
+        self.assertEqual(108, result)
 
         # atom?
         result = self.evaluate("(atom? 'x)")
-        self.assertEquals(True, result)
+        self.assertEqual(True, result)
 
         # atom?
         result = self.evaluate("(atom? '(1 2 3 4 5))")
-        self.assertEquals(False, result)
+        self.assertEqual(False, result)
+
+    def test_string_builtins(self):
+
+        result = self.evaluate("""
+            (define line '"GET /index.html 200 1534")
+            (define fields (string-split line))
+            (list (string-length line)
+                  (len fields)
+                  (string->number (car (cdr (cdr fields))))
+                  (string->number 'abc)
+                  (number->string 2.5)
+                  (substring line 4 15)
+                  (substring line 20)
+                  (string-index line '"200")
+                  (string-index line 'POST)
+                  (string-append 'a 'b 'c))
+        """)
+        self.assertEqual([24, 4, 200, False, '2.5', '/index.html', '1534',
+                           16, False, 'abc'], list(iter(result)))
+
+        result = self.evaluate("""
+            (list (regex-match '"([a-z]+)=([0-9]+)" '"x key=42 y")
+                  (regex-match '"[0-9]+" 'abc)
+                  (regex-replace '"[0-9]" '"a1b22" '"#")
+                  (len (string-split '"a,b,,c" '",")))
+        """)
+        self.assertEqual(['key=42', 'key', '42'], list(iter(car(result))))
+        self.assertEqual([False, 'a#b##', 4], list(iter(cdr(result))))
+
+    def test_memoization(self):
+
+        result = self.evaluate("""
+            (define-memo fib
+                         (lambda (n)
+                                 (if (< n 2)
+                                     n
+                                     (+ (fib (- n 1)) (fib (- n 2))))))
+            (fib 80)
+        """)
+        self.assertEqual(23416728348467685, result)
+        self.assertEqual([78, 81, 81], list(iter(self.evaluate("(memo-stats fib)"))))
+
+        self.evaluate("(memo-clear fib)")
+        self.assertEqual([0, 0, 0], list(iter(self.evaluate("(memo-stats fib)"))))
+
+        # least recently used results are evicted
+        result = self.evaluate("""
+            (define-memo square (lambda (x) (* x x)) 2)
+            (square 1) (square 2) (square 1) (square 3) (square 1) (square 2)
+            (memo-stats square)
+        """)
+        self.assertEqual([2, 4, 2], list(iter(result)))
+
+        # a cache of one result holds the last one
+        result = self.evaluate("""
+            (define-memo cube (lambda (x) (* x x x)) 1)
+            (cube 2) (cube 2) (cube 3) (cube 2)
+            (memo-stats cube)
+        """)
+        self.assertEqual([1, 3, 1], list(iter(result)))
+
+        for size in ('0', '-1', '1.5'):
+            self.assertRaises(ValueError, self.evaluate,
+                              "(memoize (lambda (x) x) %s)" % size)
+
+        self.assertRaises(ValueError, self.evaluate, "(memo-stats car)")
+
+    def test_streaming_evaluation(self):
+
+        # records how many lines were read when it's called
+        lines_read = []
+        calls = []
+        self.environment['record'] = BuiltinProcedure(lambda args: calls.append(len(lines_read)),
+                                                      'record', 0, 0)
+
+        def lines():
+            for line in ["(define a 1) (record)\n",
+                         "(record)\n",
+                         "(record) (+\n",
+                         " a\n",
+                         " 2)\n"]:
+                lines_read.append(line)
+                yield line
+
+        result = evaluator.evaluate(lines(), self.environment, streaming=True)
+        self.assertEqual(3, result)
+
+        # each expression was evaluated before the next line was read
+        self.assertEqual([1, 2, 3], calls)
+
+        self.assertEqual(None, evaluator.evaluate('', self.environment, streaming=True))
+        self.assertRaises(SyntaxError, evaluator.evaluate, ['(define b 1) (b'],
+                          self.environment, streaming=True)
+        self.assertEqual(1, self.evaluate('b'))
 
     def test_extra_lambda_values(self):
 
         # variable arguments
         result = self.evaluate("(define n-of-args (lambda (a . b) (+ (len b) 1))) (n-of-args 1 2 3 4 5)")
-        self.assertEquals(5, result)
+        self.assertEqual(5, result)
 
         # one or more arguments
         result = self.evaluate("(let ((n-of-args (lambda (a . b) (+ (len b) 1)))) (n-of-args 1))")
-        self.assertEquals(1, result)
+        self.assertEqual(1, result)
 
         # zero or more arguments
         result = self.evaluate("(define n-of-args (lambda b (len b))) (n-of-args 1 2 3 4 5)")
-        self.assertEquals(5, result)
+        self.assertEqual(5, result)
 
         # optional parameter is a list of evaluated args
         result = self.evaluate("(define id (lambda b b)) (id 1 2 3 4 5)")
-        self.assertEquals([1, 2, 3, 4, 5], list(iter(result)))
+        self.assertEqual([1, 2, 3, 4, 5], list(iter(result)))
 
     def test_quicksort(self):
 
@@ -261,8 +393,8 @@ class TestEvaluator(unittest.TestCase):
 
         result = self.evaluate(string)
 
-        self.assertEquals(10, len(result))
-        self.assertEquals([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], list(iter(result)))
+        self.assertEqual(10, len(result))
+        self.assertEqual([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], list(iter(result)))
 
     def test_tail_call_optimization(self):
 
@@ -279,7 +411,7 @@ class TestEvaluator(unittest.TestCase):
 
         # without tail-call this should reach maximum recursion depth
         result = self.evaluate(string)
-        self.assertEquals(5000, result)
+        self.assertEqual(5000, result)
 
     def test_lazy_evaluation(self):
 
@@ -299,7 +431,19 @@ class TestEvaluator(unittest.TestCase):
             (take-n 40 (count 1))
         """
         result = self.evaluate(string)
-        self.assertEquals(range(1,41), list(iter(result)))
+        self.assertEqual(list(range(1,41)), list(iter(result)))
+
+        result = self.evaluate("""
+            (define s (stream-cons 1 (+ 1 1)))
+            (list (car s) (thunk? (cdr s)) (stream-cdr s) (force (cdr s))
+                  (cdr' s) (force 3) (cdr' (cons 1 2)))
+        """)
+        self.assertEqual([1, True, 2, 2, 2, 3, 2], list(iter(result)))
+
+        # forcing is memoized
+        thunk = cdr(self.evaluate("s"))
+        self.assertTrue(thunk.is_evaluated)
+        self.assertEqual(2, thunk.expression)
 
         string = """
             (define f
@@ -311,7 +455,26 @@ class TestEvaluator(unittest.TestCase):
             (f #f (/ 1 0) 30)
         """
         result = self.evaluate(string)
-        self.assertEquals(30, result)
+        self.assertEqual(30, result)
+
+    def test_fork(self):
+        self.evaluate('(define x 1)')
+
+        fork = self.environment.fork()
+        self.assertEqual(2, evaluator.evaluate('(+ x 1)', fork))
+        self.assertEqual(2, evaluator.evaluate('(cadr (list 1 2))', fork))
+
+        # definitions don't leak into the parent, nor to other forks
+        evaluator.evaluate('(define x 10)', fork)
+        evaluator.evaluate('(define y 20)', fork)
+        self.assertEqual(30, evaluator.evaluate('(+ x y)', fork))
+        self.assertEqual(1, self.evaluate('x'))
+        self.assertFalse(self.evaluate('(defined? y)'))
+        self.assertEqual(1, evaluator.evaluate('x', self.environment.fork()))
+
+        # the files included in the parent are not included again
+        self.assertEqual(None, evaluator.evaluate('(include lib/base.scm)', fork))
+        self.assertEqual(None, fork.modules)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import os
+import unittest
+
+from scheme.environment import make_global_environment
+from scheme.procedure import BuiltinProcedure
+import scheme.evaluator as evaluator
+from scheme.cons import *
+from scheme.thunk import iter_stream
+from scheme.compat import xrange
+
+class TestFunctional(unittest.TestCase):
+
+    def setUp(self):
+        os.environ['SCHEME_PATH'] = 'lib'
+        self.environment = make_global_environment()
+        self.evaluate('(include lib/functional.scm)')
+
+        # a procedure that records its calls
+        self.calls = []
+        def record(args):
+            self.calls.append(car(args))
+            return car(args)
+        self.environment['record'] = BuiltinProcedure(record, 'record', 1, 1)
+
+    def evaluate(self, text):
+        return evaluator.evaluate(text, self.environment)
+
+    def test_lazy_pipelines(self):
+
+        result = self.evaluate("""
+            (take-n 5 (filter (lambda (x) (= 0 (mod x 2)))
+                              (map (lambda (x) (* x x)) (count 1))))
+        """)
+        self.assertEqual([4, 16, 36, 64, 100], list(iter_stream(result)))
+
+        result = self.evaluate("""
+            (define l (map record (count 1)))
+            (car l)
+        """)
+        self.assertEqual(1, result)
+        self.assertEqual([1], self.calls)
+        self.assertEqual(3, self.evaluate("(car (cdr' (cdr' l)))"))
+        self.assertEqual([1, 2, 3], self.calls)
+
+        result = self.evaluate("(take-while (lambda (x) (< x 4)) (count 1))")
+        self.assertEqual([1, 2, 3], list(iter_stream(result)))
+
+        # an error of a stage is raised every time the same cdr is forced
+        self.evaluate("(define failing (map (lambda (x) (if (= x 2) (car) x)) (count 1)))")
+        self.assertRaises(ValueError, self.evaluate, "(cdr' failing)")
+        self.assertRaises(ValueError, self.evaluate, "(cdr' failing)")
+
+    def test_stream_fusion(self):
+
+        # count the lists built by map and filter outside of a fused chain
+        built = []
+        for name in ('map', 'filter'):
+            procedure = self.environment[name]
+            def apply_stage(args, apply_stage=procedure.apply_stage):
+                built.append(args)
+                return apply_stage(args)
+            procedure.callable_ = apply_stage
+
+        result = self.evaluate("""
+            (take-n 4 (filter (lambda (x) (= 0 (mod x 3)))
+                              (map record (count 1))))
+        """)
+        self.assertEqual([3, 6, 9, 12], list(iter_stream(result)))
+        self.assertEqual([], built)
+        # the source is advanced only as needed, as in the unfused chain
+        self.assertEqual(list(range(1, 13)), self.calls)
+
+        # lists bound to names, or built by procedures called indirectly,
+        # are consumed as any other list
+        result = self.evaluate("""
+            (define squares (apply map (list (lambda (x) (* x x)) (count 1))))
+            (take-n 3 squares)
+        """)
+        self.assertEqual([1, 4, 9], list(iter_stream(result)))
+        self.assertEqual(1, len(built))
+
+        self.assertRaises(ValueError, self.evaluate, "(take-n 1 (map car))")
+
+    def test_list_procedures(self):
+
+        result = self.evaluate("""
+            (list (len (list 1 2 3))
+                  (len nil)
+                  (reduce + 0 (list 1 2 3 4))
+                  (reduce - 10 (list 1 2 3))
+                  (apply + (list 1 2 3))
+                  (car (cdr' (join (list 1) (list 2 3)))))
+        """)
+        self.assertEqual([3, 0, 10, 4, 6, 2], list(iter_stream(result)))
+
+        result = self.evaluate("(zip (list 1 2 3) (count 10))")
+        self.assertEqual([[1, 10], [2, 11], [3, 12]],
+                          [list(iter(e)) for e in iter_stream(result)])
+
+        result = self.evaluate("(join nil (list 1 2))")
+        self.assertEqual([1, 2], list(iter_stream(result)))
+
+    def test_apply_many_arguments(self):
+
+        self.environment['numbers'] = quote(make_list(xrange(2000)))
+        self.assertEqual(sum(xrange(2000)), self.evaluate("(apply + numbers)"))
+        self.assertEqual(2000, self.evaluate("(apply (lambda x (len x)) numbers)"))
+
+    def test_sort(self):
+
+        result = self.evaluate("(sort (list 8 6 0 1 5 2 9 3 4 7) >)")
+        self.assertEqual(list(range(10)), list(iter_stream(result)))
+
+        result = self.evaluate("(sort (list 8 6 0 1 5 2 9 3 4 7) (lambda (a b) (< a b)))")
+        self.assertEqual(list(range(9, -1, -1)), list(iter_stream(result)))
+
+        # equal elements are in the reverse order, as the quicksort had them
+        result = self.evaluate("""
+            (sort (list (list 1 'a) (list 0 'b) (list 1 'c) (list 0 'd) (list 1 'e))
+                  (lambda (x y) (> (car x) (car y))))""")
+        self.assertEqual(['d', 'b', 'e', 'c', 'a'],
+                         [cadr(element) for element in iter_stream(result)])
+
+        # sorted input is not quadratic anymore
+        self.environment['numbers'] = quote(make_list(xrange(3000)))
+        result = self.evaluate("(sort numbers >)")
+        self.assertEqual(list(range(3000)), list(iter_stream(result)))
+
+    def test_math_library(self):
+
+        self.evaluate("(include lib/math.scm)")
+        self.assertTrue(abs(self.evaluate("(sqrt 2)") - 2 ** .5) < 0.0001)
+        self.assertEqual(2, self.evaluate("(average 1 2 3)"))
+
+if __name__ == '__main__':
+    unittest.main()
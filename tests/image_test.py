@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scheme.environment import make_global_environment
+from scheme.evaluator import evaluate
+from scheme.cons import *
+import scheme.image as image
+
+class TestImage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'environment.img')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        environment = make_global_environment()
+        evaluate("""
+            (define square (lambda (x) (* x x)))
+            (define fib (memoize (lambda (n)
+                                         (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))))
+            (define numbers (quote %s))
+            (define hash (hash-map 'a 1 'b 2))
+            (fib 20)""" % repr(make_list(range(20000))), environment)
+
+        image.save_image(environment, self.path)
+        restored = image.load_image(self.path)
+
+        self.assertEqual(16, evaluate('(square 4)', restored))
+        self.assertEqual(20000, evaluate('(len numbers)', restored))
+        self.assertEqual('0', evaluate('(car numbers)', restored))
+        self.assertEqual(2, evaluate("(hash-map-ref hash 'b)", restored))
+
+        # the memoized results were saved, and the built-ins are linked
+        self.assertEqual(6765, evaluate('(fib 20)', restored))
+        self.assertEqual(21, evaluate('(car (cdr (memo-stats fib)))', restored))
+        self.assertTrue(restored['+'] is not environment['+'])
+        self.assertEqual(restored['+'].name, '+')
+
+        # the definitions of the restored environment are its own
+        evaluate('(define square 0)', restored)
+        self.assertEqual(16, evaluate('(square 4)', environment))
+
+    def test_errors(self):
+        environment = make_global_environment()
+        environment['f'] = quote(lambda args: args)
+        self.assertRaises(ValueError, image.save_image, environment, self.path)
+
+        with open(self.path, 'w') as f:
+            f.write('(define x 1)')
+        self.assertRaises(ValueError, image.load_image, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
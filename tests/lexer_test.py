@@ -2,6 +2,10 @@
 #! coding: utf-8
 
 import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 import scheme.lexer as lexer
 
@@ -89,10 +93,10 @@ class TestLexer(unittest.TestCase):
 
         tokens = list(tokenizer.tokens(string))
 
-        self.assertEquals(len(expected_tokens), len(tokens))
+        self.assertEqual(len(expected_tokens), len(tokens))
 
         for expected, token in zip(expected_tokens, tokens):
-            self.assertEquals(expected, (token.type, token.value))
+            self.assertEqual(expected, (token.type, token.value))
 
     def test_end_of_string_right_after_last_token(self):
         tokenizer = lexer.Tokenizer(self.rules, start='START')
@@ -107,10 +111,93 @@ class TestLexer(unittest.TestCase):
 
         tokens = list(tokenizer.tokens(string))
 
-        self.assertEquals(len(expected_tokens), len(tokens))
+        self.assertEqual(len(expected_tokens), len(tokens))
 
         for expected, token in zip(expected_tokens, tokens):
-            self.assertEquals(expected, (token.type, token.value))
+            self.assertEqual(expected, (token.type, token.value))
+
+    def test_chunks_and_positions(self):
+        tokenizer = lexer.Tokenizer(self.rules, start='START')
+
+        string = u'(ação  "a\\"b"\n  ; comment\n  12.5)'
+        expected_tokens = [('LPAREN', '(', 1, 2),
+                           ('SYMBOL', u'ação', 1, 6),
+                           ('STRING', 'a"b', 1, 14),
+                           ('FLOAT', 12.5, 3, 7),
+                           ('RPAREN', ')', 3, 8)]
+
+        # the same tokens, whatever the chunks of input are
+        for chunks in (string, list(string), [string[:4], string[4:9], string[9:]]):
+            tokens = [(token.type, token.value, token.line, token.column)
+                      for token in tokenizer.tokens(chunks)]
+            self.assertEqual(expected_tokens, tokens)
+
+        self.assertRaises(SyntaxError, list, tokenizer.tokens('"abc'))
+
+    def test_pattern_tokenizer(self):
+        tokenizer = lexer.PatternTokenizer([(r'\s+', None),
+                                            (r';[^\n]*', None),
+                                            (r'\(', 'LPAREN'),
+                                            (r'\)', 'RPAREN'),
+                                            (r'"(?:[^"\\]|\\.)*"', 'STRING'),
+                                            (r'#([0-9a-f]+)', 'SYMBOL'),
+                                            (r'[0-9]+\.[0-9]*', 'FLOAT'),
+                                            (r'[^\s;\(\)"]+', 'SYMBOL')],
+                                           chunk_size=3, partial=r'"(?:[^"\\]|\\.)*\\?')
+
+        string = u'(ação  "a\\"b"\n  ; comment\n  12.5 #ff)'
+        expected_tokens = [('LPAREN', '(', 1, 2),
+                           ('SYMBOL', u'ação', 1, 6),
+                           ('STRING', 'a"b', 1, 14),
+                           ('FLOAT', 12.5, 3, 7),
+                           ('SYMBOL', 'ff', 3, 11),
+                           ('RPAREN', ')', 3, 12)]
+
+        # the same tokens, whatever the chunks of input are
+        for chunks in (string, list(string), [string[:4], string[4:9], string[9:]],
+                       StringIO(string)):
+            tokens = [(token.type, token.value, token.line, token.column)
+                      for token in tokenizer.tokens(chunks)]
+            self.assertEqual(expected_tokens, tokens)
+
+        self.assertRaises(SyntaxError, list, tokenizer.tokens('(a "abc'))
+
+    def test_pattern_tokenizer_errors(self):
+        tokenizer = lexer.PatternTokenizer([(r'\s+', None),
+                                            (r'[a-z]+', 'SYMBOL'),
+                                            (r'"[a-z]*"', 'STRING')],
+                                           partial=r'"[a-z]*')
+        read = []
+        def chunks(*values):
+            for chunk in values:
+                read.append(chunk)
+                yield chunk
+
+        # unmatched text is reported before the next chunk is read
+        tokens = tokenizer.tokens(chunks('ab % cd', 'ef', 'gh'))
+        self.assertEqual('ab', next(tokens).value)
+        self.assertRaises(SyntaxError, next, tokens)
+        self.assertEqual(['ab % cd'], read)
+
+        # unless it may be the beginning of a token
+        del read[:]
+        tokens = tokenizer.tokens(chunks('ab "cd', 'ef"', ' gh'))
+        self.assertEqual(['ab', 'cdef', 'gh'], [token.value for token in tokens])
+
+        del read[:]
+        tokens = tokenizer.tokens(chunks('ab "cd e', 'f"', 'gh'))
+        self.assertEqual('ab', next(tokens).value)
+        self.assertRaises(SyntaxError, next, tokens)
+        self.assertEqual(['ab "cd e'], read)
+
+        # input read a char at a time (as the repl does) is scanned when a
+        # space ends the token, before more input is read
+        del read[:]
+        tokens = tokenizer.tokens(chunks(*'abc de\nfg'))
+        self.assertEqual('abc', next(tokens).value)
+        self.assertEqual(list('abc '), read)
+        self.assertEqual('de', next(tokens).value)
+        self.assertEqual(list('abc de\n'), read)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,14 @@
 #! /usr/bin/env python
 #! coding: utf-8
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from scheme.evaluator import string_to_scheme as s
 from scheme.evaluator import evaluate
+from scheme.environment import make_global_environment
 from scheme.cons import *
 from scheme.macro import *
 
@@ -16,7 +20,7 @@ class TestMacro(unittest.TestCase):
             self.compare_result(car(expected), car(actual))
             self.compare_result(cdr(expected), cdr(actual))
         else:
-            self.assertEquals(expected, actual)
+            self.assertEqual(expected, actual)
 
     def test_simple_macros(self):
 
@@ -126,7 +130,119 @@ class TestMacro(unittest.TestCase):
                          (+ x y))
         """
         result = evaluate(string)
-        self.assertEquals(30, result)
+        self.assertEqual(30, result)
+
+    def test_include_once(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            library = os.path.join(directory, 'library.scm')
+            with open(library, 'w') as f:
+                f.write('(define x 1)')
+
+            environment = make_global_environment()
+            evaluate('(include %s)' % library, environment)
+            self.assertEqual(1, evaluate('x', environment))
+            evaluate('(define x 2)', environment)
+
+            # the file is not read again in the same environment, even if
+            # named by another path
+            os.remove(library)
+            self.assertEqual(None, evaluate('(include %s)' % library, environment))
+            evaluate('(include %s/../%s/library.scm)' % (directory, os.path.basename(directory)),
+                     environment)
+            self.assertEqual(2, evaluate('x', environment))
+
+            # but it's included in other environments
+            self.assertRaises(ValueError, evaluate, '(include %s)' % library,
+                              make_global_environment())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_include_errors(self):
+
+        directory = tempfile.mkdtemp()
+        current = os.getcwd()
+        try:
+            library = os.path.join(directory, 'library.scm')
+            with open(library, 'w') as f:
+                f.write('(define x 1) (car) (define y 2)')
+
+            # a file that fails is included again
+            environment = make_global_environment()
+            self.assertRaises(ValueError, evaluate, '(include %s)' % library, environment)
+            with open(library, 'w') as f:
+                f.write('(define x 1) (define y 2)')
+            evaluate('(include %s)' % library, environment)
+            self.assertEqual(2, evaluate('y', environment))
+
+            # relative names are resolved from the current directory
+            for name in ('a', 'b'):
+                os.mkdir(os.path.join(directory, name))
+                with open(os.path.join(directory, name, 'library.scm'), 'w') as f:
+                    f.write('(define z (quote %s))' % name)
+            for name in ('a', 'b'):
+                os.chdir(os.path.join(directory, name))
+                evaluate('(include library.scm)', environment)
+                self.assertEqual(name, evaluate('z', environment))
+        finally:
+            os.chdir(current)
+            shutil.rmtree(directory)
+
+    def test_autoload(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            library = os.path.join(directory, 'library.scm')
+            with open(library, 'w') as f:
+                f.write("""(define x 1)
+                           (define y (+ x 1))
+                           (define broken (1 . 2 3))
+                           (define x 10)
+                           (record 'loaded)""")
+
+            environment = make_global_environment()
+            calls = []
+            environment['record'] = lambda args: calls.append(car(args))
+
+            evaluate('(autoload %s)' % library, environment)
+            self.assertEqual(['loaded'], calls)
+            self.assertEqual(set(['x', 'y', 'broken']), set(environment.autoloads))
+            self.assertTrue(evaluate('(defined? broken)', environment))
+
+            # definitions are read as they are looked up, in order
+            self.assertEqual(11, evaluate('y', environment))
+            self.assertEqual(set(['broken']), set(environment.autoloads))
+            self.assertRaises(SyntaxError, evaluate, 'broken', environment)
+
+            # a definition replaces the autoloaded one
+            evaluate('(define x 2)', environment)
+            self.assertEqual(2, evaluate('x', environment))
+
+            # the forms of load guards are autoloaded unless the marker is
+            # defined
+            for name in ('guarded.scm', 'copy.scm'):
+                with open(os.path.join(directory, name), 'w') as f:
+                    f.write("""(if (defined? __guarded__) nil
+                                   (begin (define g 1)
+                                          (record 'guarded)
+                                          (define __guarded__ nil)))""")
+                evaluate('(autoload %s)' % os.path.join(directory, name), environment)
+            self.assertEqual(['loaded', 'guarded'], calls)
+            self.assertEqual(set(['g', '__guarded__']), set(environment.autoloads))
+            self.assertEqual(1, evaluate('g', environment))
+
+            # without an environment, the expressions are read as they are
+            plain = os.path.join(directory, 'plain.scm')
+            with open(plain, 'w') as f:
+                f.write("""(define a 1)
+                           (record a)
+                           (unless (defined? __plain__) (define b 2))""")
+            macro = AutoloadMacro(IncludeMacro())
+            self.assertEqual('((define a 1) (record a) (unless (defined? __plain__) (define b 2)))',
+                              pretty_print(macro.transform(make_list(['autoload', plain]))))
+        finally:
+            shutil.rmtree(directory)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from scheme.environment import make_global_environment
+import scheme.evaluator as evaluator
+import scheme.numeric as numeric
+from scheme.numeric import *
+
+class TestNumeric(unittest.TestCase):
+
+    #: the NumPy module the arrays use, or None for the array module
+    numpy = None
+
+    def setUp(self):
+        self.backend = numeric.numpy
+        numeric.numpy = self.numpy
+        self.environment = make_global_environment()
+        evaluator.evaluate('(include lib/base.scm)', self.environment)
+
+    def tearDown(self):
+        numeric.numpy = self.backend
+
+    def evaluate(self, text):
+        return evaluator.evaluate(text, self.environment)
+
+    def test_element_wise_arithmetic(self):
+
+        a = NumericArray([1, 2, 3])
+        b = NumericArray([10, 20, 30])
+
+        self.assertEqual([11, 22, 33], list(a + b))
+        self.assertEqual([9, 18, 27], list(b - a))
+        self.assertEqual([2, 4, 6], list(a * 2))
+        self.assertEqual([9, 8, 7], list(10 - a))
+        self.assertEqual([0.5, 1.0, 1.5], list(a / 2.))
+        self.assertEqual([False, True, True], list(a > 1))
+        self.assertEqual([True, False, False], list(2 > a))
+        self.assertRaises(ValueError, lambda: a + NumericArray([1, 2]))
+
+    def test_booleans_and_equality(self):
+
+        a = NumericArray([True, False])
+        b = NumericArray([1, 2, 3])
+
+        self.assertEqual([2, 0], list(a + a))
+        self.assertEqual([1, 0], list(a * a))
+        self.assertEqual([2, 1], list(a + True))
+        self.assertEqual([0, -1], list(a - True))
+        self.assertEqual([False, True, False], list(equal(b, 2)))
+        self.assertEqual([True, False, True], list(equal(b, NumericArray([1, 0, 3]))))
+        self.assertEqual([False, True], list(self.evaluate("(= 2 (array 1 2))")))
+        self.assertTrue(self.evaluate("(= 2 2)"))
+
+    def test_overflow(self):
+
+        big = NumericArray([2 ** 62, 1])
+
+        self.assertRaises(ValueError, lambda: big * 4)
+        self.assertRaises(ValueError, lambda: big + big)
+        self.assertRaises(ValueError, lambda: 0 - big - big - big)
+        self.assertRaises(ValueError, lambda: big * 2 ** 62)
+        self.assertRaises(ValueError, lambda: big + 2 ** 70)
+        self.assertRaises(ValueError, lambda: 2 ** 70 - big)
+        self.assertRaises(ValueError, lambda: divide(NumericArray([-2 ** 63]), -1))
+        self.assertEqual([2 ** 63 - 1, 2 ** 62], list(big + (2 ** 62 - 1)))
+        self.assertEqual([-2 ** 63, -2], list(big * -2))
+        try:
+            big * 4
+        except ValueError as e:
+            self.assertEqual("Integer out of the range of numeric arrays: %s" % 2 ** 64, str(e))
+
+    def test_reductions(self):
+
+        a = NumericArray([1, 2, 3, 4])
+
+        self.assertEqual(10, array_sum(a))
+        self.assertEqual(2.5, array_mean(a))
+        self.assertEqual(30, array_dot(a, a))
+        self.assertEqual(2, array_sum(a > 2))
+        self.assertEqual([0, 2, 4, 6], list(array_range(0, 8, 2)))
+        self.assertRaises(ValueError, array_mean, NumericArray([]))
+
+    def test_builtins(self):
+
+        result = self.evaluate("""
+            (define xs (array-range 0 1000))
+            (define ys (+ (* xs 2) 1))
+            (list (array-length ys) (array-ref ys 10) (sum ys)
+                  (mean (array 1 2 3)) (dot (array 1 2) (array 3 4))
+                  (sum (< xs 10)) (array? ys) (array? 1))
+        """)
+        self.assertEqual([1000, 21, 1000000, 2.0, 11, 10, True, False],
+                          list(result))
+
+    def test_list_conversions(self):
+
+        result = self.evaluate("""
+            (define l (array->list (- (list->array (list 1 2 3)) 1)))
+            (list (car l) (car (cdr' l)) (len l) (sum (list 1 2 3)))
+        """)
+        self.assertEqual([0, 1, 3, 6], list(result))
+
+    def test_errors(self):
+
+        a = NumericArray([7, -7])
+
+        self.assertEqual([3, -4], list(divide(a, 2)))
+        self.assertRaises(ZeroDivisionError, divide, a, 0)
+        self.assertRaises(ZeroDivisionError, lambda: a / 0.)
+        self.assertRaises(ZeroDivisionError, lambda: a % 0)
+        self.assertRaises(ZeroDivisionError, divide, 1, NumericArray([1, 0]))
+        self.assertRaises(ZeroDivisionError, self.evaluate, "(/ (array 1 2) 0)")
+
+        self.assertRaises(ValueError, NumericArray, [1, 'a'])
+        self.assertRaises(ValueError, NumericArray, [1, 2 ** 70])
+        self.assertRaises(ValueError, self.evaluate, "(array 1 (quote a))")
+        if self.numpy is not None:
+            self.assertRaises(ValueError, NumericArray, numpy.array(['a']))
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumPyNumeric(TestNumeric):
+
+    numpy = numpy
+
+if __name__ == '__main__':
+    unittest.main()
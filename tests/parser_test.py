@@ -5,6 +5,7 @@ import unittest
 
 import scheme.lexer as lexer
 import scheme.parser as parser
+from scheme.compat import xrange
 
 class TestParser(unittest.TestCase):
 
@@ -113,15 +114,15 @@ class TestParser(unittest.TestCase):
 
         def compare(expected, actual):
             if type(expected) == dict:
-                name, sub_expected = expected.items()[0]
+                name, sub_expected = list(expected.items())[0]
 
                 self.assertFalse(actual.is_terminal)
-                self.assertEquals(name, actual.name)
-                self.assertEquals(len(sub_expected), len(actual.value))
+                self.assertEqual(name, actual.name)
+                self.assertEqual(len(sub_expected), len(actual.value))
 
                 compare(sub_expected, actual.value)
             elif type(expected) == list:
-                self.assertEquals(len(expected), len(actual))
+                self.assertEqual(len(expected), len(actual))
 
                 for exp, act in zip(expected, actual):
                     compare(exp, act)
@@ -129,9 +130,9 @@ class TestParser(unittest.TestCase):
                 tok_type, tok_value = expected
 
                 self.assertTrue(actual.is_terminal)
-                self.assertEquals(tok_type, actual.name)
-                self.assertEquals(tok_type, actual.value.type)
-                self.assertEquals(tok_value, actual.value.value)
+                self.assertEqual(tok_type, actual.name)
+                self.assertEqual(tok_type, actual.value.type)
+                self.assertEqual(tok_value, actual.value.value)
 
         compare(expected_tree, tree)
 
@@ -140,12 +141,48 @@ class TestParser(unittest.TestCase):
         try:
             self.parser.parse(self.tokenizer.tokens("(add foo bar"))
         except SyntaxError as s:
-            self.assertEquals("Unexpected end of input. Expecting RPAREN", s.message)
+            self.assertEqual("Unexpected end of input. Expecting RPAREN", str(s))
 
         try:
             self.parser.parse(self.tokenizer.tokens("(add foo bar))"))
         except SyntaxError as s:
-            self.assertEquals("Unexpected ) at line 1, column 15. Expecting end of tokens", s.message)
+            self.assertEqual("Unexpected ) at line 1, column 15. Expecting end of tokens", str(s))
+
+    def test_packrat(self):
+
+        # the same trees and errors
+        self.parser.packrat = True
+        self.test_parse()
+        self.test_parse_error()
+
+        # a grammar with ambiguous prefixes: every alternative of a nested
+        # list matches the inner list before failing
+        def count_matches(packrat):
+            p = parser.Parser(start='nested', packrat=packrat)
+            p.grammar = {'nested': (p.token('LPAREN') & p.expression('nested') &
+                                    p.token('RPAREN') & p.token('INTEGER')) |
+                                   (p.token('LPAREN') & p.expression('nested') &
+                                    p.token('RPAREN') & p.token('FLOAT')) |
+                                   (p.token('LPAREN') & p.expression('nested') &
+                                    p.token('RPAREN') & p.token('SYMBOL')) |
+                                   p.token('STRING')}
+
+            # counts the matches of the nested expression
+            calls = []
+            class Counted(parser.Expression):
+                def match(self, tokens, mandatory=False):
+                    calls.append(tokens.idx)
+                    return nested.match(tokens, mandatory)
+            nested = p.grammar['nested']
+            p.grammar['nested'] = Counted('nested', p)
+
+            depth = 8
+            tree = p.parse(self.tokenizer.tokens('(' * depth + '"x"' + ') a' * depth))
+            self.assertEqual('nested', tree.name)
+            return len(calls)
+
+        self.assertEqual(sum(3 ** k for k in xrange(9)), count_matches(False))
+        self.assertEqual(9, count_matches(True))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,140 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import unittest
+
+from scheme.environment import make_global_environment
+import scheme.evaluator as evaluator
+from scheme.persistent import *
+from scheme.compat import xrange
+
+class Collider(object):
+    "A key whose hash always collides with the other keys"
+
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return type(other) == Collider and self.name == other.name
+
+class TestPersistent(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = make_global_environment()
+        evaluator.evaluate('(include lib/base.scm)', self.environment)
+
+    def evaluate(self, text):
+        return evaluator.evaluate(text, self.environment)
+
+    def test_map_assoc_and_get(self):
+
+        empty = PersistentMap()
+        m = empty
+        for i in xrange(2000):
+            m = m.assoc(i, i * i)
+
+        self.assertEqual(0, len(empty))
+        self.assertEqual(2000, len(m))
+        for i in xrange(2000):
+            self.assertEqual(i * i, m.get(i))
+        self.assertEqual(None, m.get(2000))
+        self.assertEqual('default', m.get(2000, 'default'))
+
+        # old versions are untouched
+        updated = m.assoc(10, 'ten')
+        self.assertEqual('ten', updated.get(10))
+        self.assertEqual(100, m.get(10))
+        self.assertEqual(2000, len(updated))
+
+    def test_map_dissoc(self):
+
+        m = make_map(['a', 1, 'b', 2, 'c', 3])
+        without_b = m.dissoc('b')
+
+        self.assertEqual(2, len(without_b))
+        self.assertFalse('b' in without_b)
+        self.assertTrue('b' in m)
+        self.assertTrue(without_b.dissoc('x') is without_b)
+
+        for i in xrange(1000):
+            m = m.assoc(i, i)
+        for i in xrange(1000):
+            m = m.dissoc(i)
+        self.assertEqual(set(['a', 'b', 'c']), set(m))
+
+    def test_map_hash_collisions(self):
+
+        a, b, c = Collider('a'), Collider('b'), Collider('c')
+        m = make_map([a, 1, b, 2, c, 3])
+
+        self.assertEqual(3, len(m))
+        self.assertEqual([1, 2, 3], [m.get(a), m.get(b), m.get(c)])
+
+        m = m.dissoc(b).dissoc(a)
+        self.assertEqual(1, len(m))
+        self.assertEqual(3, m.get(c))
+        self.assertFalse(a in m)
+
+    def test_vector_push_pop_and_assoc(self):
+
+        empty = PersistentVector()
+        v = empty
+        for i in xrange(5000):
+            v = v.push(i)
+
+        self.assertEqual(5000, len(v))
+        self.assertEqual(list(range(5000)), list(v))
+        self.assertEqual(1234, v.nth(1234))
+
+        changed = v.assoc(1234, 'x').assoc(4999, 'y')
+        self.assertEqual('x', changed.nth(1234))
+        self.assertEqual('y', changed.nth(4999))
+        self.assertEqual(1234, v.nth(1234))
+
+        while len(v) > 1000:
+            v = v.pop()
+        self.assertEqual(list(range(1000)), list(v))
+        self.assertRaises(ValueError, v.nth, 1000)
+        self.assertRaises(ValueError, empty.pop)
+
+    def test_builtins(self):
+
+        result = self.evaluate("""
+            (define m (hash-map 'a 1 'b 2))
+            (define m2 (hash-map-set m 'c 3))
+            (list (hash-map-count m)
+                  (hash-map-count m2)
+                  (hash-map-ref m2 'c)
+                  (hash-map-ref m 'c 'none)
+                  (hash-map-contains? (hash-map-remove m2 'a) 'a))
+        """)
+        self.assertEqual([2, 3, 3, 'none', False], list(result))
+
+        result = self.evaluate("""
+            (define v (list->vector (list 1 2 3)))
+            (define v2 (vector-push (vector-set v 0 10) 4))
+            (list (vector-ref v 0) (vector-ref v2 0) (vector-length v2)
+                  (len (vector->list v2)) (vector? v2) (vector? m2))
+        """)
+        self.assertEqual([1, 10, 4, 4, True, False], list(result))
+
+    def test_lazy_list_conversions(self):
+
+        result = self.evaluate("""
+            (define l (vector->list (vector 1 2 3)))
+            (list (car l) (thunk? (cdr l)) (car (cdr' l)) (car (cdr' (cdr' l))))
+        """)
+        self.assertEqual([1, True, 2, 3], list(result))
+
+        result = self.evaluate("""
+            (define count (lambda (n) (cons' n (count (+ n 1)))))
+            (define take-n (lambda (n l) (if (= n 0) nil (cons' (car l) (take-n (- n 1) (cdr' l))))))
+            (vector-length (list->vector (take-n 100 (count 0))))
+        """)
+        self.assertEqual(100, result)
+
+if __name__ == '__main__':
+    unittest.main()
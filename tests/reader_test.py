@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from scheme.evaluator import string_to_scheme, evaluate, EXPRESSION
+from scheme.environment import make_global_environment, data_atom
+from scheme.reader import Reader
+from scheme.cons import *
+from scheme.compat import xrange
+
+class TestReader(unittest.TestCase):
+
+    def assertSyntaxError(self, message, string, start_parsing=None):
+        try:
+            if start_parsing is None:
+                string_to_scheme(string)
+            else:
+                string_to_scheme(string, start_parsing)
+            self.fail("%s was read" % string)
+        except SyntaxError as e:
+            self.assertEqual(message, str(e))
+
+    def test_deep_and_long_lists(self):
+
+        depth = 100000
+        result = car(string_to_scheme('(' * depth + 'x' + ')' * depth))
+        for _ in xrange(depth - 1):
+            result = car(result)
+        self.assertEqual('x', car(result))
+
+        result = string_to_scheme('(%s . end)' % ' '.join(['e'] * 200000), EXPRESSION)
+        self.assertEqual(200000, len(result))
+        self.assertEqual('end', result.terminal())
+
+        self.assertEqual('a', string_to_scheme('(. a)', EXPRESSION))
+        self.assertEqual(None, string_to_scheme(' ; nothing\n'))
+
+        # empty strings, with the bulk tokenizer and with the lexer rules
+        for bulk_tokenizer in (True, False):
+            tokens = Reader().tokens('(a "" b)', bulk_tokenizer)
+            self.assertEqual(['(', 'a', '', 'b', ')'], [token.value for token in tokens])
+            tokens = Reader().tokens('a ""', bulk_tokenizer)
+            self.assertEqual(['a', ''], [token.value for token in tokens])
+
+    def test_errors(self):
+
+        self.assertSyntaxError('Unexpected end of input. Expecting RPAREN', '(a (b c)')
+        self.assertSyntaxError('Expecting RPAREN, but found (. At line 2, column 3',
+                               '(a\n (b c')
+        self.assertSyntaxError('Expecting RPAREN, but found .. At line 1, column 5', '(a . )')
+        self.assertSyntaxError('Expecting RPAREN, but found c. At line 1, column 9', '(a . b c)')
+        self.assertSyntaxError("Expecting LPAREN, but found '. At line 1, column 2", "''a")
+        self.assertSyntaxError("Expecting RPAREN, but found '. At line 1, column 5", "(a ''b)")
+        self.assertSyntaxError('Unexpected <Token RPAREN ")">, expected end of input. '
+                               'At line 1, column 8', '(a b) )')
+
+    def test_tokenizer_errors(self):
+
+        # both tokenizers report the same errors, at the same positions
+        for text, message in [('(a "abc', 'unexpected end of stream line: 1, column: 8'),
+                              ('(a\n  "ab\ncd', 'unexpected end of stream line: 3, column: 3'),
+                              ('x\n"\\', 'unexpected end of stream line: 2, column: 3'),
+                              ('a "\\\nb', 'unexpected char at line: 1, column: 5: "\n"')]:
+            for bulk_tokenizer in (True, False):
+                try:
+                    list(Reader().tokens(text, bulk_tokenizer))
+                    self.fail("%r was tokenized" % text)
+                except SyntaxError as e:
+                    self.assertEqual(message, str(e))
+
+    def test_reader_cache(self):
+
+        reader = Reader(cache_size=2)
+
+        program = reader.read('(define x 1) (+ x 1)')
+        self.assertTrue(program is reader.read('(define x 1) (+ x 1)'))
+        self.assertEqual('x', reader.read('x', EXPRESSION))
+        self.assertEqual((1, 2), (reader.hits, reader.misses))
+
+        # the least recently used text is evicted
+        reader.read('(a b)')
+        self.assertEqual(2, len(reader.cache))
+        self.assertTrue(program is not reader.read('(define x 1) (+ x 1)'))
+        self.assertEqual((1, 4), (reader.hits, reader.misses))
+
+        # files and errors are not cached
+        self.assertEqual('(a b)', repr(reader.read(StringIO('(a b)'), EXPRESSION)))
+        self.assertRaises(SyntaxError, reader.read, '(a b')
+        self.assertEqual(2, len(reader.cache))
+
+        reader.clear()
+        self.assertEqual((0, 0, 0), (reader.hits, reader.misses, len(reader.cache)))
+
+    def test_data(self):
+
+        data = '; records\n(1 -2.5 "3" abc (x . 4) \'q)\n.5 -x 1e3 inf'
+
+        datums = list(Reader().data(StringIO(data), data_atom))
+        self.assertEqual('((1 -2.5 3 abc (x . 4) (quote q)) 0.5 -x 1000.0 inf)',
+                          repr(make_list(datums)))
+        kind = lambda e: 'symbol' if is_symbol(e) else type(e)
+        self.assertEqual([int, float, 'symbol', 'symbol'], [kind(datum) for datum in datums[0]][:4])
+        self.assertEqual([float, 'symbol', float, 'symbol'], [kind(datum) for datum in datums[1:]])
+
+        self.assertRaises(SyntaxError, list, Reader().data('(1 2', data_atom))
+
+        # the builtins read from file ports
+        environment = make_global_environment()
+        environment['port'] = lambda args: StringIO(data)
+        self.assertEqual(1000.0, evaluate("(car (cdr (cdr (cdr (read-data (port))))))",
+                                           environment))
+        self.assertEqual(-2.5, evaluate("(car (cdr (car (read-data-stream (port)))))",
+                                         environment))
+
+if __name__ == '__main__':
+    unittest.main()
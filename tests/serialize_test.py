@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+#! coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from scheme.environment import make_global_environment
+import scheme.evaluator as evaluator
+from scheme.cons import *
+from scheme.serialize import *
+from scheme.compat import xrange
+
+class TestSerialize(unittest.TestCase):
+
+    def setUp(self):
+        self.environment = make_global_environment()
+        evaluator.evaluate('(include lib/base.scm)', self.environment)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def evaluate(self, text):
+        return evaluator.evaluate(text, self.environment)
+
+    def test_round_trip(self):
+
+        value = make_list([1, -1, 2 ** 70, -(2 ** 70), 0, 1.5, 2j, True, False,
+                           None, 'symbol', u'ação', cons('a', 'b'),
+                           make_list(['nested', make_list([1, 2])])])
+
+        result = loads(dumps(value))
+
+        self.assertEqual(repr(value), repr(result))
+        self.assertEqual(type(u''), type(list(result)[11]))
+        self.assertEqual(None, loads(dumps(None)))
+        self.assertEqual('atom', loads(dumps('atom')))
+
+    def test_shared_structure(self):
+
+        shared = make_list(['x', 'y'])
+        value = make_list([shared, shared, 'sym', 'sym'])
+
+        data = dumps(value)
+        result = loads(data)
+
+        self.assertTrue(car(result) is cadr(result))
+        self.assertEqual(1, data.count(b'sym'))
+
+    def test_long_lists(self):
+
+        value = make_list(xrange(100000))
+        self.assertEqual(list(range(100000)), list(loads(dumps(value))))
+
+    def test_invalid_data(self):
+
+        self.assertRaises(ValueError, loads, b'not serialized')
+        self.assertRaises(ValueError, loads, dumps(make_list([1, 2]))[:-2])
+        self.assertRaises(ValueError, dumps, object())
+
+    def test_builtins(self):
+
+        path = os.path.join(self.directory, 'value.bin')
+        self.environment['path'] = quote(path)
+
+        result = self.evaluate("""
+            (define count (lambda (n) (cons' n (count (+ n 1)))))
+            (define take-n (lambda (n l) (if (= n 0) nil (cons' (car l) (take-n (- n 1) (cdr' l))))))
+            (dump (list (take-n 5 (count 1)) 'done 2.5) path)
+            (load path)
+        """)
+
+        self.assertEqual([1, 2, 3, 4, 5], list(car(result)))
+        self.assertEqual(['done', 2.5], list(cdr(result)))
+
+if __name__ == '__main__':
+    unittest.main()